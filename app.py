@@ -1,5 +1,12 @@
+import threading
+import collections
 import streamlit as st
-from grammar_excerciser import GrammarExcerciser
+import models
+import capacity
+from grammar_excerciser import GrammarExcerciser, TOPIC_NAMES
+from parse_cache import ParseCache
+from sampler import SessionSampler
+from excercise_bank import ExcerciseBank
 
 if 'stage' not in st.session_state:
     st.session_state['stage'] = 0
@@ -16,10 +23,82 @@ if 'error_type' not in st.session_state:
 if 'text' not in st.session_state:
     st.session_state['text'] = ''
 
-# read file into str
+if 'sources' not in st.session_state:
+    st.session_state['sources'] = []
+
+if 'available' not in st.session_state:
+    st.session_state['available'] = []
+
+if 'analysis' not in st.session_state:
+    st.session_state['analysis'] = None
+
+if 'sampler' not in st.session_state:
+    st.session_state['sampler'] = None
+
 FILENAME = 'red_cap.txt'
-with open(FILENAME) as f:
-    plaintext = f.read()
+# analyses of uploaded texts kept for the sessions to share
+MAX_ANALYSES = 16
+
+@st.cache_resource
+def warm_up_models():
+    # load the models once at server start instead of on the first click
+    models.warm_up(['nlp', 'sentzer', 'inflect'])
+
+@st.cache_data
+def read_text(filename):
+    # read file into str once per process, not on every rerun
+    with open(filename) as f:
+        return f.read()
+
+@st.cache_resource
+def get_bank():
+    # excercises of the curated texts made beforehand (python excercise_bank.py red_cap.txt)
+    return ExcerciseBank.load()
+
+def banked_topics():
+    # topics of the default text the bank has excercises of
+    return get_bank().topics(FILENAME, read_text(FILENAME))
+
+# with all the topics of the default text in the bank the models are loaded with the first uploaded text only
+if not get_bank().has(FILENAME, read_text(FILENAME), TOPIC_NAMES.values()):
+    warm_up_models()
+
+@st.cache_resource
+def get_parse_cache():
+    # one on-disk parse cache shared by all the sessions
+    return ParseCache()
+
+@st.cache_resource
+def get_default_analysis():
+    # the default text is parsed and analysed once per process
+    return GrammarExcerciser(read_text(FILENAME), cache=get_parse_cache())
+
+@st.cache_resource
+def get_analyses():
+    # text -> analysis shared by all the sessions, the least recently used ones are dropped
+    return collections.OrderedDict(), threading.Lock()
+
+def shared_analysis(text, previous=None):
+    # the analysis of the text, made once for all the sessions using it. the topics are analysed when first asked for.
+    # an edit of the session's previous text is analysed from it, only the changed sentences are parsed again
+    analyses, lock = get_analyses()
+    with lock:
+        if text in analyses:
+            analyses.move_to_end(text)
+            return analyses[text]
+    if previous is None:
+        analysis = GrammarExcerciser(text, cache=get_parse_cache(), topics=[])
+    else:
+        analysis = previous.edited(text)
+    with lock:
+        # another session may have made it meanwhile
+        analysis = analyses.setdefault(text, analysis)
+        analyses.move_to_end(text)
+        while len(analyses) > MAX_ANALYSES:
+            analyses.popitem(last=False)
+    return analysis
+
+plaintext = read_text(FILENAME)
 
 exercise_messages = {'past': ['Past tenses', 'Select the past tense'],
                      'passive': ['Passive voice', 'Select the verb form'],
@@ -43,36 +122,68 @@ def type_excercises():
             ex_list.append('prep')
     return list(set(ex_list))
 
-def get_excercises(ge):
-    all_exs = []
+def session_sampler(analysis, bank=None):
+    # the sampler of the session: its random numbers and the sentences it was given. a new one when the session moves to another text.
+    # the sampler of the default text draws the banked topics from the bank, the analysis is given to it when a topic is missing there
+    session = st.session_state['sampler']
+    if session is None or session.bank is not bank or (bank is None and session.analysis is not analysis):
+        session = SessionSampler(analysis, bank=bank, name=FILENAME if bank is not None else None)
+        st.session_state['sampler'] = session
+    elif session.analysis is None:
+        session.analysis = analysis
+    return session
+
+def get_excercises(analysis, bank=None):
+    # generators of the excercises of every topic. the session draws from the shared analysis (and the bank) with its own
+    # random numbers and used rows. the excercises are made while the form is drawn, so the first ones are shown before the rest are found
+    session = session_sampler(analysis, bank)
+    # sentences of the previous rounds are not given again. a topic that would give fewer excercises than it could
+    # (num_sentences, or all its sentences when it has fewer) gets its sentences back
     for type in st.session_state['ex_types']:
-        if type == 'past':
-            all_exs.append(ge.get_past_tenses_excercises(num_sentences))
-        elif type == 'passive':
-            all_exs.append(ge.get_active_passive_excercises(num_sentences))
-        elif type == 'be':
-            all_exs.append(ge.get_be_excercises(num_sentences))
-        elif type == 'prep':
-            all_exs.append(ge.get_prep_excercises(num_sentences))
-    return all_exs
+        topic = TOPIC_NAMES[type]
+        if session.remaining(topic) < min(num_sentences, len(session.rows(topic))):
+            session.reset(topic)
+    sources = [session.iter_excercises(TOPIC_NAMES[type]) for type in st.session_state['ex_types']]
+    st.session_state['sources'] = sources
+    return [[] for _ in sources]
+
+def stream_excercise(num):
+    # excercises of the topic made so far, then new ones from its generator until there are num_sentences of them.
+    # the generator is kept for the next reruns (the slider may be moved up), it's dropped when the topic runs out of sentences
+    excercise = st.session_state['excercises'][num]
+    yield from list(excercise)
+    source = st.session_state['sources'][num]
+    while source is not None and len(excercise) < num_sentences:
+        task = next(source, None)
+        if task is None:
+            st.session_state['sources'][num] = None
+            break
+        excercise.append(task)
+        yield task
 
 def set_stage(i):
     st.session_state['stage'] = i
 
 def set_stage_upload_text(text):
     st.session_state['text'] = text
-    ge = GrammarExcerciser(text)
     st.session_state['ex_types'] = type_excercises()
+    # the length is checked with the sentencizer alone, texts of wrong length are never parsed
+    error = capacity.check_length(len(capacity.split_sentences(text)))
 
-    if ge.df.shape[0] < 100:
+    if error is not None:
         set_stage(1)   
-        st.session_state['error_type'] = 'too_short' 
+        st.session_state['error_type'] = error
     elif len(st.session_state['ex_types']) == 0:
         set_stage(1)      
     else:
         set_stage(2)
-        
-        st.session_state['excercises'] = get_excercises(ge)
+        analysis = shared_analysis(text, st.session_state['analysis'])
+        st.session_state['analysis'] = analysis
+        # sentences of every topic are counted on the analysis, so a shortage is told before any excercise is made
+        names = [TOPIC_NAMES[type] for type in st.session_state['ex_types']]
+        report = capacity.estimate(text, names, num_sentences, excerciser=analysis)
+        st.session_state['available'] = [report['topics'][name] for name in names]
+        st.session_state['excercises'] = get_excercises(analysis)
 
 def set_stage_default_text():
     st.session_state['ex_types'] = type_excercises()
@@ -80,11 +191,15 @@ def set_stage_default_text():
         set_stage(1)
     else:
         set_stage(2)    
-        ge = GrammarExcerciser(plaintext)    
-        st.session_state['ex_types'] = type_excercises()
-
-        
-        st.session_state['excercises'] = get_excercises(ge)
+        st.session_state['available'] = [None for _ in st.session_state['ex_types']]
+        banked = banked_topics()
+        bank = get_bank() if len(banked) > 0 else None
+        if all(TOPIC_NAMES[type] in banked for type in st.session_state['ex_types']):
+            # all the topics are drawn from the bank, the text is not analysed at all
+            st.session_state['excercises'] = get_excercises(None, bank)
+        else:
+            # the topics missing from the bank are made from the analysis of the default text
+            st.session_state['excercises'] = get_excercises(get_default_analysis(), bank)
 
 def try_another_text():
     set_stage(0)
@@ -112,7 +227,10 @@ with col3:
 
 if st.session_state['stage'] == 1:
     if st.session_state['error_type'] == 'too_short':
-        st.write('Sorry, your text seems too short. Please try a text of at least 100 sentences')
+        st.write(f'Sorry, your text seems too short. Please try a text of at least {capacity.MIN_SENTENCES} sentences')
+        st.button('Try another text', on_click=try_another_text)
+    elif st.session_state['error_type'] == 'too_long':
+        st.write(f'Sorry, your text seems too long. Please try a text of at most {capacity.MAX_SENTENCES} sentences')
         st.button('Try another text', on_click=try_another_text)
     elif len(st.session_state['ex_types']) == 0:
         st.write('No grammar topics are chosen. Please select one or more')
@@ -129,9 +247,11 @@ if st.session_state['stage'] >= 2:
         for num in range(len(st.session_state['excercises'])):
             excercise = st.session_state['excercises'][num]
             st.subheader(exercise_messages[st.session_state['ex_types'][num]][1])
+            available = st.session_state['available'][num]
+            if available is not None and available < num_sentences:
+                st.write(f'The text has only {available} sentences for this topic')
             
-            for j in range(len(excercise)):
-                task = excercise[j]
+            for j, task in enumerate(stream_excercise(num)):
                 col1, col2 = st.columns(2)
                 with col1:
                     st.write('')
@@ -152,6 +272,9 @@ if st.session_state['stage'] >= 2:
                                 key=str(num) + str(j) + str(i),
                                 label_visibility="hidden")                  
                 '---'    
+            if (available is None or available >= num_sentences) and len(excercise) < num_sentences:
+                # the generators stop when the text has no more sentences for the topic
+                st.write(f'Only {len(excercise)} sentences for this topic could be found in the text')
         st.form_submit_button("Submit", on_click=set_stage, args=[3])
         
 if st.session_state['stage'] >= 3:
@@ -0,0 +1,109 @@
+"""makes excercises for a lot of texts at once and writes them to a JSONL file, a line per text.
+usage: python batch_excercises.py texts/ other.txt -o excercises.jsonl [--topics past_tenses prepositions] [--num 6] [--processes 4]
+texts already in the output file are skipped, so an interrupted run goes on from where it stopped.
+models are loaded once per worker process
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import multiprocessing
+
+# topic -> name of the generator
+GENERATORS = {'past_tenses': 'get_past_tenses_excercises',
+              'active_passive': 'get_active_passive_excercises',
+              'be': 'get_be_excercises',
+              'prepositions': 'get_prep_excercises',
+              'vocab_selection': 'get_vocab_selection_excercises'}
+# texts analysed by a worker process before it's replaced by a new one, so that its memory doesn't grow
+TEXTS_PER_WORKER = 50
+
+def find_texts(paths):
+  """(str list) -> (str list)
+  returns the files listed and the .txt files of the directories listed
+  """
+  texts = []
+  for path in paths:
+    if os.path.isdir(path):
+      texts.extend(sorted(os.path.join(path, f) for f in os.listdir(path) if f.endswith('.txt')))
+    else:
+      texts.append(path)
+  return texts
+
+def done_texts(output):
+  """(str) -> (set)
+  returns paths of the texts already in the output file. texts that failed are tried again
+  """
+  done = set()
+  if not os.path.exists(output):
+    return done
+  with open(output) as f:
+    for line in f:
+      try:
+        record = json.loads(line)
+      except ValueError:
+        # a line cut by an interrupted run
+        continue
+      if 'error' not in record:
+        done.add(record['path'])
+  return done
+
+def make_excercises(task):
+  """((str, str, str list, int, int)) -> (dict)
+  analyses a text and runs the generators of the topics. returns the line of the output:
+  path, number of sentences, excercises per topic and seconds spent on the analysis and on every topic
+  """
+  path, kind, topics, num_ex, seed = task
+  record = {'path': path}
+  try:
+    start = time.perf_counter()
+    if kind == 'english':
+      from english_excerciser import EnglishExcerciser as Excerciser
+    else:
+      from grammar_excerciser import GrammarExcerciser as Excerciser
+    with open(path) as f:
+      text = f.read()
+    excerciser = Excerciser(text, topics=[])
+    record['sentences'] = len(excerciser.store)
+    record['seconds'] = {'parse': time.perf_counter() - start}
+    record['excercises'] = {}
+    for topic in topics:
+      if seed is not None:
+        random.seed(seed)
+      topic_start = time.perf_counter()
+      record['excercises'][topic] = getattr(excerciser, GENERATORS[topic])(num_ex)
+      record['seconds'][topic] = time.perf_counter() - topic_start
+    record['seconds']['total'] = time.perf_counter() - start
+  except Exception as e:
+    record['error'] = repr(e)
+  return record
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('paths', nargs='+', help='text files and directories with .txt files')
+  parser.add_argument('-o', '--output', default='excercises.jsonl')
+  parser.add_argument('--kind', choices=['grammar', 'english'], default='grammar', help='GrammarExcerciser or EnglishExcerciser')
+  parser.add_argument('--topics', nargs='+', choices=list(GENERATORS), default=['past_tenses', 'active_passive', 'be', 'prepositions'])
+  parser.add_argument('--num', type=int, default=6, help='excercises per topic')
+  parser.add_argument('--processes', type=int, default=os.cpu_count())
+  parser.add_argument('--seed', type=int, default=None, help='makes the excercises of every text repeatable')
+  args = parser.parse_args()
+  if args.kind == 'grammar' and 'vocab_selection' in args.topics:
+    parser.error('vocab_selection needs --kind english')
+
+  done = done_texts(args.output)
+  tasks = [(path, args.kind, args.topics, args.num, args.seed) for path in find_texts(args.paths) if path not in done]
+  print('%d texts to go, %d done before' % (len(tasks), len(done)), file=sys.stderr)
+
+  with multiprocessing.Pool(args.processes, maxtasksperchild=TEXTS_PER_WORKER) as pool, open(args.output, 'a') as out:
+    # every text is written as soon as it's ready
+    for num, record in enumerate(pool.imap_unordered(make_excercises, tasks), 1):
+      out.write(json.dumps(record, ensure_ascii=False) + '\n')
+      out.flush()
+      status = record.get('error') or '%.2f s' % record['seconds']['total']
+      print('[%d/%d] %s: %s' % (num, len(tasks), record['path'], status), file=sys.stderr)
+
+if __name__ == '__main__':
+  main()
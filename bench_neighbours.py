@@ -0,0 +1,59 @@
+"""recall vs latency of the approximate (LSH) neighbour index against the exact search.
+usage: python bench_neighbours.py [--words 300] [--tables 8 16 32] [--bits 12 14 16]
+"""
+import argparse
+import time
+import numpy as np
+import models
+from similarity import SimilarityEngine, LSHIndex
+
+def recall(exact, approx):
+  """(dict, dict) -> (float)
+  share of the exact neighbours found by the approximate index
+  """
+  found = total = 0
+  for word, neighbours in exact.items():
+    truth = {x[0] for x in neighbours}
+    found += len(truth & {x[0] for x in approx.get(word, [])})
+    total += len(truth)
+  return found / max(total, 1)
+
+def timed(f, *args):
+  """(function, ...) -> (object, float)
+  returns result of the call and its duration in seconds
+  """
+  start = time.perf_counter()
+  result = f(*args)
+  return result, time.perf_counter() - start
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--words', type=int, default=300, help='number of query words, taken among the most frequent ones')
+  parser.add_argument('--vocab', type=int, default=50000, help='queries are sampled from the first VOCAB words')
+  parser.add_argument('--tables', type=int, nargs='+', default=[8, 16, 32])
+  parser.add_argument('--bits', type=int, nargs='+', default=[12, 14, 16])
+  parser.add_argument('--seed', type=int, default=0)
+  args = parser.parse_args()
+
+  word_vectors = models.get('word_vectors')
+  rng = np.random.default_rng(args.seed)
+  vocab = word_vectors.index_to_key[:args.vocab]
+  words = [vocab[i] for i in rng.choice(len(vocab), size=min(args.words, len(vocab)), replace=False)]
+
+  exact_engine = SimilarityEngine(word_vectors)
+  exact_similar, t_similar = timed(exact_engine.similar_by_words, words, 10)
+  exact_pairs, t_pairs = timed(exact_engine.most_similar_by_pair, words, ('good', 'bad'), 5)
+  print('%d words, vocabulary of %d' % (len(words), len(word_vectors.index_to_key)))
+  print('%-8s %-6s %-6s %10s %12s %12s %12s' % ('index', 'tables', 'bits', 'build, s', 'ms per word', 'recall@10', 'pair rec@5'))
+  print('%-8s %-6s %-6s %10s %12.2f %12.3f %12.3f' % ('exact', '-', '-', '-', 1000 * (t_similar + t_pairs) / len(words), 1, 1))
+
+  for n_tables in args.tables:
+    for n_bits in args.bits:
+      index, t_build = timed(LSHIndex, word_vectors, n_tables, n_bits)
+      similar, t_similar = timed(index.similar_by_words, words, 10)
+      pairs, t_pairs = timed(index.most_similar_by_pair, words, ('good', 'bad'), 5)
+      print('%-8s %-6d %-6d %10.2f %12.2f %12.3f %12.3f' % ('lsh', n_tables, n_bits, t_build,
+            1000 * (t_similar + t_pairs) / len(words), recall(exact_similar, similar), recall(exact_pairs, pairs)))
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,65 @@
+import models
+from grammar_excerciser import GrammarExcerciser
+
+# texts the app makes excercises of: from MIN_SENTENCES to MAX_SENTENCES sentences
+MIN_SENTENCES = 100
+MAX_SENTENCES = 5000
+# sentences analysed at once when counting excercises
+BATCH_SENTENCES = 200
+TOPICS = ['past_tenses', 'active_passive', 'be', 'prepositions']
+
+def split_sentences(text):
+  """(str) -> (spacy.Span list)
+  sentences of the text, found by the sentencizer only (no parsing)
+  """
+  return list(models.get('sentzer')(text).sents)
+
+def check_length(num_sentences):
+  """(int) -> (str)
+  returns 'too_short' or 'too_long' for a text the app can't use, None for a good one
+  """
+  if num_sentences < MIN_SENTENCES:
+    return 'too_short'
+  if num_sentences > MAX_SENTENCES:
+    return 'too_long'
+  return None
+
+def topic_counts(excerciser, topics=TOPICS):
+  """(GrammarExcerciser, str list) -> (dict)
+  returns topic -> number of sentences excercises of the topic can be made of. the counts are taken from the index,
+  topics not analysed yet are analysed (the text is not parsed again)
+  """
+  for topic in topics:
+    excerciser.analyse(topic)
+  return {topic: len(set().union(*excerciser.index[topic].values())) for topic in topics}
+
+def estimate(text, topics=TOPICS, needed=None, batch_sentences=BATCH_SENTENCES, excerciser_class=GrammarExcerciser, excerciser=None):
+  """(str, str list, int, int, class, GrammarExcerciser) -> (dict)
+  reports how many excercises a text can give before it's analysed as a whole:
+  'sentences' - number of sentences (the sentencizer only), 'error' - what check_length says about it,
+  'topics' - topic -> number of sentences for the topic, 'complete' - True if all the text was counted.
+  the text is analysed batch_sentences sentences at a time and counting stops as soon as every topic has needed sentences.
+  texts of wrong length are not analysed at all.
+  excerciser is one made for the text already (a shared analysis, one read from the parse cache): the counts are taken from
+  its index, nothing is parsed again
+  """
+  if excerciser is not None:
+    error = check_length(len(excerciser.store))
+    counts = dict.fromkeys(topics, 0) if error is not None else topic_counts(excerciser, topics)
+    return {'sentences': len(excerciser.store), 'error': error, 'topics': counts, 'complete': True}
+
+  sentences = split_sentences(text)
+  report = {'sentences': len(sentences), 'error': check_length(len(sentences)), 'topics': dict.fromkeys(topics, 0), 'complete': False}
+  if report['error'] is not None:
+    return report
+
+  for start in range(0, len(sentences), batch_sentences):
+    batch = sentences[start:start+batch_sentences]
+    # a whole number of sentences, so the batch is split into the same sentences again
+    counts = topic_counts(excerciser_class(text[batch[0].start_char:batch[-1].end_char], topics=topics), topics)
+    for topic in topics:
+      report['topics'][topic] += counts[topic]
+    if needed is not None and all(count >= needed for count in report['topics'].values()):
+      return report
+  report['complete'] = True
+  return report
@@ -0,0 +1,81 @@
+"""checks that the analysis made by update after a range of edits is the same as the analysis of the edited text made from scratch:
+the token store, the df and the index of every topic. exits with 1 on the first difference.
+usage: python check_update.py [red_cap.txt ...] [--english] [--repeat 10]
+"""
+import sys
+import argparse
+import numpy as np
+import topic_index
+
+STRING_COLUMNS = ['lower', 'pos', 'lemma', 'dep', 'match_label']
+ARRAY_COLUMNS = ['sent_chars', 'sent_tokens', 'tok_start', 'tok_end', 'sent_matches', 'match_start', 'match_end']
+
+def edits(text):
+  """(str) -> ((str, str) list)
+  returns (name, edited text) of the edits tried. the excerciser is updated with them one after another,
+  so every update starts from the analysis of the previous edit
+  """
+  middle = len(text) // 2
+  return [('replace a word', text.replace('Little Red Cap', 'Little Blue Cap', 1)),
+          ('change sentences in several places', text.replace('The wolf', 'The big bad wolf', 3)),
+          ('append sentences', text + ' She was sleeping when the hunter came. The cake had been eaten by the wolf.'),
+          ('prepend a sentence', 'She ran home. ' + text),
+          ('delete from the middle', text[:middle] + text[middle + len(text) // 10:]),
+          ('cut the beginning', text[len(text) // 5:]),
+          ('back to the text', text),
+          ]
+
+def differences(updated, fresh):
+  """(GrammarExcerciser, GrammarExcerciser) -> (str list)
+  returns what differs between two analyses of the same text, nothing for the same ones
+  """
+  found = []
+  a, b = updated.store, fresh.store
+  for column in STRING_COLUMNS:
+    if not np.array_equal(a.string_array[getattr(a, column)], b.string_array[getattr(b, column)]):
+      found.append('store.' + column)
+  for column in ARRAY_COLUMNS:
+    if not np.array_equal(getattr(a, column), getattr(b, column)):
+      found.append('store.' + column)
+  if list(updated.df.columns) != list(fresh.df.columns):
+    found.append('df columns %s != %s' % (list(updated.df.columns), list(fresh.df.columns)))
+  else:
+    for column in updated.df.columns:
+      for row, (u, v) in enumerate(zip(updated.df[column], fresh.df[column])):
+        if not (topic_index.missing(u) and topic_index.missing(v)) and (topic_index.missing(u) or topic_index.missing(v) or u != v):
+          found.append('df[%r][%d]: %r != %r' % (column, row, u, v))
+          break
+  if updated.index.keys() != fresh.index.keys():
+    found.append('index topics %s != %s' % (sorted(updated.index), sorted(fresh.index)))
+  else:
+    for topic in updated.index:
+      for subtype in updated.index[topic]:
+        if updated.index[topic][subtype] != fresh.index[topic][subtype]:
+          found.append('index[%r][%r]' % (topic, subtype))
+  return found
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('paths', nargs='*', default=['red_cap.txt'])
+  parser.add_argument('--english', action='store_true', help='check EnglishExcerciser (with vocabulary selection) instead of GrammarExcerciser')
+  parser.add_argument('--repeat', type=int, default=10, help='the text is repeated to make it long enough for the app')
+  args = parser.parse_args()
+  if args.english:
+    from english_excerciser import EnglishExcerciser as Excerciser
+  else:
+    from grammar_excerciser import GrammarExcerciser as Excerciser
+
+  failed = False
+  for path in args.paths:
+    with open(path) as f:
+      text = f.read() * args.repeat
+    excerciser = Excerciser(text)
+    for name, edited in edits(text):
+      excerciser.update(edited)
+      found = differences(excerciser, Excerciser(edited))
+      print('%s, %s: %s' % (path, name, '; '.join(found) or 'ok'))
+      failed = failed or len(found) > 0
+  sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+  main()
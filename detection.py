@@ -0,0 +1,70 @@
+import numpy as np
+
+###################
+# utils
+def sentence_of(store):
+  """(TokenStore) -> (np.array)
+  returns number of the sentence of every token
+  """
+  return np.repeat(np.arange(len(store)), np.diff(store.sent_tokens))
+
+def by_sentence(store, positions, *values):
+  """(TokenStore, np.array, np.array...) -> (list list)
+  splits sorted token positions (and values matching them) into per-sentence lists.
+  positions are returned relative to their sentence. sentences with nothing found get np.nan
+  """
+  bounds = np.searchsorted(positions, store.sent_tokens)
+  relative = positions - np.repeat(store.sent_tokens[:-1], np.diff(bounds))
+  result = []
+  for column in (relative,) + values:
+    per_sentence = []
+    for row in range(len(store)):
+      start, end = bounds[row], bounds[row+1]
+      per_sentence.append(column[start:end].tolist() if end > start else np.nan)
+    result.append(per_sentence)
+  return result
+
+###################
+# functions
+def find_verbs(store):
+  """(TokenStore) -> (list, list, list, list) tuple
+  gathers verbs and combinations auxiliary-verb matched by grammar_matcher in all the sentences at once.
+  returns per sentence: list of verbs, 1 for a sentence with an analytic verb form or 0, indices of the verbs in the sentence
+  and lemmas of the (main) verbs. np.nan for sentences without verbs
+  """
+  words = store.string_array[store.lower]
+  lemmas_lower = np.array([s.lower() for s in store.strings], dtype=object)[store.lemma]
+
+  # A. aux + verbs. Higher priority cause they're less numerous
+  analytic = store.match_positions('aux_verb')
+  # B. plain verbs, except the ones taken by an analytic form
+  verbs = store.match_positions('verb')
+  plain = verbs[~np.isin(verbs, analytic) & ~np.isin(verbs, analytic + 1)]
+
+  positions = np.union1d(analytic, plain)
+  is_analytic = np.isin(positions, analytic)
+  following = np.minimum(positions + 1, len(words) - 1)
+  verbs = np.where(is_analytic, words[positions] + ' ' + words[following], words[positions])
+  lemmas = np.where(is_analytic, lemmas_lower[following], lemmas_lower[positions])
+
+  idx, verbs, lemmas = by_sentence(store, positions, verbs, lemmas)
+  # 1 for analytic verb form: counts of analytic forms reduced per sentence
+  counts = np.bincount(sentence_of(store)[analytic], minlength=len(store))
+  flags = [np.nan if found is np.nan else int(count > 0) for found, count in zip(idx, counts)]
+  return verbs, flags, idx, lemmas
+
+def find_be(store):
+  """(TokenStore) -> (list, list) tuple
+  gathers forms of the verb BE matched by grammar_matcher. returns per sentence list of forms and their indices
+  """
+  positions = store.match_positions('be')
+  idx, forms = by_sentence(store, positions, store.string_array[store.lower[positions]])
+  return forms, idx
+
+def find_prep(store):
+  """(TokenStore) -> (list, list) tuple
+  gathers prepositions matched by grammar_matcher. returns per sentence list of prepositions and their indices
+  """
+  positions = store.match_positions('prep')
+  idx, preps = by_sentence(store, positions, store.string_array[store.lower[positions]])
+  return preps, idx
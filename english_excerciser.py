@@ -1,57 +1,53 @@
-import spacy
-import pandas as pd
+import threading
 import numpy as np
-from spacy.lang.en import English
 import random
-import gensim.downloader as api
-from pyinflect import getInflection
-
-word_vectors = api.load('glove-wiki-gigaword-100')
-
-sentzer = English()
-sentzer.add_pipe('sentencizer')
-
-nlp = spacy.load("en_core_web_sm")
-
-class EnglishExcerciser():
-
-  def __init__(self, text):
-    """(self, str) -> (self)
-    builds df out of a str text
-    initiates an empty list of sentences already used in excercises (not to produce excercises based on the same sentences)
+import models
+import topic_index
+from grammar_excerciser import GrammarExcerciser, BATCH_SIZE, N_PROCESS, WEIGHTS
+from sampler import RowSampler
+
+def __getattr__(name):
+  """(str) -> (object)
+  models stay importable from this module (e.g. from english_excerciser import nlp), but are loaded on first access, not on import
+  """
+  if name in ('nlp', 'sentzer', 'word_vectors'):
+    return models.get(name)
+  raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+# topic -> method adding the df columns of the topic and the first of the columns it adds.
+# vocabulary selection needs no columns, its options are found for the sentences drawn (see vocab_gaps)
+ANALYSIS = dict(GrammarExcerciser.analysis_steps, vocab_selection=(None, None))
+# names of the topics in the app (type_excercises)
+TOPIC_NAMES = dict(GrammarExcerciser.topic_names, vocab='vocab_selection')
+# parts of speech of vocabulary selection excercises and how often they're chosen
+MAIN_POS = {'noun': 0.35, 'verb': 0.35, 'adjective': 0.2, 'adverb': 0.1}
+
+class EnglishExcerciser(GrammarExcerciser):
+  analysis_steps = ANALYSIS
+  topic_names = TOPIC_NAMES
+
+  def __init__(self, text, batch_size=BATCH_SIZE, n_process=N_PROCESS, cache=None, approximate=False, topics=None):
+    """(self, str, int, int, ParseCache, bool, str list) -> (self)
+    GrammarExcerciser with vocabulary selection excercises.
+    with approximate the options for vocabulary selection are looked up in the LSH index instead of the exact search
     """
-    self.df = self.build_df(text)
-    self.vocab_selection_options_to_df()
-    self.verbs_to_df()
-    self.be_to_df()
-    self.prep_to_df()
-    self.used_rows = []
+    self.neighbour_index = 'similarity_lsh' if approximate else 'similarity'
+    super().__init__(text, batch_size, n_process, cache, topics)
 
-  ###################
-  # utils
-  def get_pos(self, x):
-    """(str) -> (str)
-    returns part of speech. use for found similar words to filter parts of speech
+  def cache_key_parts(self):
+    """(self) -> (str list)
+    the options of vocabulary selection depend on the word vectors and the similarity engine as well
     """
-    words = nlp(x)
-    for word in words:
-      return spacy.explain(word.pos_)
-    
-  def get_num(self, x):
-    """(str) -> (str)
-    returns Sing or Plur
-    """
-    words = nlp(x)
-    for word in words:
-      return word.morph.get('Number')
-    
-  def get_form(self, x):
-    """(str) -> (str)
-    returns verb form
+    return super().cache_key_parts() + [models.VECTORS_NAME, self.neighbour_index]
+
+  def add_columns(self, columns):
+    """(str list) -> (self)
+    as GrammarExcerciser.add_columns, with the vocabulary selection columns
     """
-    words = nlp(x)
-    for word in words:
-      return word.morph.get('VerbForm')
+    super().add_columns(columns)
+    # vocabulary selection columns are only there if vocab_selection_options_to_df was called
+    if 'noun_vocab_selection_correct' in columns:
+      self.vocab_selection_options_to_df()
 
   ###################
   # functions
@@ -61,32 +57,32 @@ class EnglishExcerciser():
     returns list of all words of the given POS in the sentence, list of POS and list of indices,
     so that the resultng words could be found in the sentence
     """
-    all_words = np.array([str(word).lower() for word in self.df['wordlist'][row_number]])
-    values = np.array(self.df['pos'][row_number])
-    sent = self.df['raw'][row_number]
+    all_words = self.store.words(row_number)
+    values = self.store.poses(row_number)
 
     searchval = pos
     idx = np.where(values == searchval)[0]
-    return([(all_words[i], values[i], [word for word in self.df['wordlist'][row_number]][i].i - sent.start) for i in sorted(idx) if str(all_words[i]).isalpha() and len(str(all_words[i])) > 1])
+    return([(all_words[i], values[i], int(i)) for i in sorted(idx) if str(all_words[i]).isalpha() and len(str(all_words[i])) > 1])
 
-  def get_options(self, original_word, pos, num_options=2):   
-      """(str, str, int) -> (str, list, float) tuple
+  def get_options(self, original_word, pos, num_options=2, neighbours=None):   
+      """(str, str, int, tuple) -> (str, list, float) tuple
       generates similar options out of the given word of a given part of speech.
+      neighbours of the word found by the similarity engine can be passed (e.g. found for all the words of the text at once),
+      otherwise they are looked up for the single word.
       returns the original word, list of similar words with the original added and shuffled 
       along with the calculated quality so that different sets of similar words could be later compared and the best one chosen.
       """ 
       
+      word_vectors = models.get('word_vectors')
+      if neighbours is None:
+        neighbours = models.get(self.neighbour_index).neighbours([original_word])[original_word]
+      similar, by_pairs = neighbours
+
       # A: find similar by word
-      result = word_vectors.similar_by_word(original_word)
-      a = {x[0] for x in result[:15]}
+      a = {x[0] for x in similar[:15]}
 
-      # B: find similar using pairs
-      pairs = [('good', 'bad')]
-      result = []
-      for pair in pairs:
-        wordlist = word_vectors.most_similar(positive=[original_word, pair[0]], negative=pair[1])[:5]
-        result.extend(wordlist)
-      b = set([x[0] for x in result])
+      # B: find similar using pairs ('good' - 'bad')
+      b = set([x[0] for x in by_pairs])
       total = a|b
 
       # filter
@@ -107,38 +103,89 @@ class EnglishExcerciser():
       quality = num_options + 1 - sum([x[1] for x in dist_sorted[:num_options]])
       return original_word, alts, quality
 
-  def get_vocab_selection(self, pos, num_options=2):
-    """(str, int) -> (str list, (str list) list, int list) tuple
+  def best_vocab_option(self, row, pos, num_options=2, neighbours=None):
+    """(int, str, int, dict) -> (str, str list, int list) tuple
+    returns correct, options and index (in a list) of the word of a given POS in the sentence with the best options by quality,
+    None if there are no words with enough options.
+    neighbours of the words are looked up in one batched pass of the similarity engine unless already given
+    """
+    wordset = self.find_main_pos(row, pos)
+    if len(wordset) == 0:
+      return None
+    words = {str(word[0]) for word in wordset}
+    if neighbours is None:
+      neighbours = models.get(self.neighbour_index).neighbours(words)
+    # tag the words and all their neighbours in one pass, so that the filters of get_options are lookups
+    models.get('lexicon').fill(list(words) + [x[0] for word in words if word in neighbours for kind in neighbours[word] for x in kind])
+
+    opt_list = []
+    for word in wordset:
+      text, pos, idx = word
+      text = str(text)
+      try:
+        options = self.get_options(text, pos, num_options, neighbours[text])
+      except:
+        options=(word, [], 0)
+      if len(options[1]) == num_options + 1:
+        original_word, alts, quality = options
+        opt_list.append((original_word, alts, quality, [idx]))
+    if len(opt_list) == 0:
+      return None
+    best = max(opt_list, key=lambda x:x[2])
+    return best[0], best[1], best[3]
+
+  def vocab_gaps(self, row, pos, neighbours=None):
+    """(int, str, dict) -> (dict list)
+    returns the gap of a vocabulary selection excercise for the sentence, [] if the sentence has no word with good options.
+    found on the first call for the (row, pos) and memoized in the index
+    """
+    rows = self.index['vocab_selection'][pos]
+    if rows[row] is None:
+      best = self.best_vocab_option(row, pos, neighbours=neighbours)
+      rows[row] = [] if best is None else [topic_index.gap(best[0], best[1], best[2][0])]
+    return rows[row]
+
+  def fill_vocab_options(self, background=False):
+    """(bool) -> (threading.Thread)
+    finds the vocabulary selection options for all the sentences not drawn yet, with neighbours of all their words in one pass.
+    with background it's done in a daemon thread, which is returned
+    """
+    if background:
+      thread = threading.Thread(target=self.fill_vocab_options, daemon=True)
+      thread.start()
+      return thread
+    self.analyse('vocab_selection')
+    index = self.index['vocab_selection']
+    todo = [(row, pos) for pos in index for row in list(index[pos]) if index[pos][row] is None]
+    words = {str(word[0]) for row, pos in todo for word in self.find_main_pos(row, pos)}
+    neighbours = models.get(self.neighbour_index).neighbours(words)
+    models.get('lexicon').fill(list(neighbours) + [x[0] for found in neighbours.values() for kind in found for x in kind])
+    for row, pos in todo:
+      self.vocab_gaps(row, pos, neighbours)
+    lexicon = models.get('lexicon')
+    if lexicon.path is not None:
+      lexicon.save()
+
+  def get_vocab_selection(self, pos, num_options=2, neighbours=None):
+    """(str, int, dict) -> (str list, (str list) list, int list) tuple
     returns lists of corrects and options of a given POS for the whole dataframe.
     first gets lists of options for all the words of the desired POS then chooses best one by quality.
+    neighbours of all the words are found in one batched pass of the similarity engine unless already given.
     index of the correct word is added so that it could be found within the original sentence
     """
 
     # get list of a given pos for every sentence
     wordsets = [self.find_main_pos(row, pos) for row in range(self.df.shape[0])]
+    if neighbours is None:
+      neighbours = models.get(self.neighbour_index).neighbours({str(word[0]) for wordset in wordsets for word in wordset})
+    # tag the words and all their neighbours in one pass, so that the filters of get_options are lookups
+    models.get('lexicon').fill(list(neighbours) + [x[0] for found in neighbours.values() for kind in found for x in kind])
 
-    bests = []
-
-    for wordset in wordsets:
-      opt_list = []
-      for word in wordset:
-        text, pos, idx = word
-        text = str(text)
-        try:
-          options = self.get_options(text, pos, num_options)
-        except:
-          options=(word, [], 0)
-        if len(options[1]) == 3:
-          original_word, alts, quality = options
-          options = original_word, alts, quality, [idx]
-          opt_list.append(options)
-      if len(opt_list) > 0:
-        best = max(opt_list, key=lambda x:x[2])
-        bests.append(best)
-      else: bests.append((np.nan, np.nan, np.nan, np.nan))
+    bests = [self.best_vocab_option(row, pos, num_options, neighbours) for row in range(self.df.shape[0])]
+    bests = [(np.nan, np.nan, np.nan) if best is None else best for best in bests]
     corrects = [x[0] for x in bests]
     options = [x[1] for x in bests]
-    indices = [x[3] for x in bests]
+    indices = [x[2] for x in bests]
     return corrects, options, indices
   
   def vocab_selection_options_to_df(self):
@@ -146,126 +193,20 @@ class EnglishExcerciser():
     adds columns with vocabulary selection corrects, options and indices to the df
     """
 
+    # neighbours of the words of all the parts of speech in one batched pass
+    words = {str(word[0]) for pos in ['noun', 'verb', 'adverb', 'adjective'] for row in range(self.df.shape[0]) for word in self.find_main_pos(row, pos)}
+    neighbours = models.get(self.neighbour_index).neighbours(words)
+
     for pos in ['noun', 'verb', 'adverb', 'adjective']:
 
-      selector = self.get_vocab_selection(pos)
+      selector = self.get_vocab_selection(pos, neighbours=neighbours)
       self.df[pos+'_vocab_selection_correct'] = selector[0]
       self.df[pos+'_vocab_selection_options'] = selector[1]
       self.df[pos+'_vocab_selection_idx'] = selector[2]
-  
-  def find_verbs(self, row_number):
-    """(int) -> (str list, int, int list)
-    finds verbs and combinations auxiliary-verb in a given row of the dataframe.
-    returns list of verbs, 1 for analytic verb form or 0 for synthetic and list of indices
-    used to find the verbs in the sentence
-    """
-    all_words = np.array([str(word).lower() for word in self.df['wordlist'][row_number]])
-    values = np.array(self.df['pos'][row_number])
-    lemmas = np.array(self.df['lemma'][row_number])
-
-    # A. search aux + verbs. Higher priority cause they're less numerous
-    idx = []
-    for i in range(len(values)-1):
-      if [lemmas[i], np.roll(values, -1)[i]] in [['be', 'verb'], ['have', 'verb']]:
-        idx.append(i)
-
-    # B. search for plain verbs
-    idx2 = []
-    for pos in ['auxiliary', 'verb']:
-      searchval = pos
-      idx2.extend(np.where(values == searchval)[0].tolist())
-    idx2 = [i for i in idx2 if (i not in idx and i-1 not in idx)]
-    total_idx = sorted(idx + idx2)
-    
-    # put mark 1 for analytic form of verb
-    result = [[all_words[i]+' '+all_words[i+1] if (i in idx) else all_words[i] for i in total_idx ], [1 for i in sorted(idx)] + [0 for i in sorted(idx2)], [i for i in total_idx]]
-    
-    if 1 in result[1]:
-      result[1] = 1
-    else: result[1] = 0
-    if len(result[0]) == 0:
-      result = [np.nan, np.nan, np.nan]
-
-    return result
-  
-  def verbs_to_df(self):
-    """(self) -> (self)
-    adds columns with verbs to the df
-    """
-    verb_finder = [self.find_verbs(row) for row in range(self.df.shape[0])]
-    self.df['verbs'] = [x[0] for x in verb_finder]
-    self.df['analytic_verb_form'] = [x[1] for x in verb_finder]
-    self.df['verbs_idx'] = [x[2] for x in verb_finder]
-  
-  def find_verbs_lemma(self, verb, num_row):
-    """(str, int) -> (str)
-    finds lemma of a verb listed in column 'verbs'. not to use with nan values in 'verbs'
-    """
-    verblist = self.df['verbs'][num_row]
-    order_num = verblist.index(verb)
-    if num_row in self.df[self.df['analytic_verb_form'] == 1].index.to_list() and len(verb.split()) > 1:
-      sentence_idx = self.df['verbs_idx'][num_row][order_num] + 1
-    else: sentence_idx = self.df['verbs_idx'][num_row][order_num]
-    return self.df['lemma'][num_row][sentence_idx].lower()
-
-  def find_be(self, row_number):
-    """(int) -> ((str) list, (int) list) tuple
-    finds forms of the verb BE
-    """
-    all_words = np.array([str(word).lower() for word in self.df['wordlist'][row_number]])
-    lemmas = np.array(self.df['lemma'][row_number])
-    sent = self.df['raw'][row_number]
-
-    searchval = 'be'
-    idx = np.where(lemmas == searchval)[0]
-    result = ([all_words[i] for i in sorted(idx) if all_words[i] not in ["'s", "'re", "'m"]],
-              [np.array([word for word in self.df['wordlist'][row_number]])[i].i - sent.start for i in sorted(idx) if all_words[i] not in ["'s", "'re", "'m"]])
-    return( result if len(result[0]) > 0 else (np.nan, np.nan))
-
-  def be_to_df(self):
-    """(self) -> (self)
-    adds columns with be to the df
-    """
-    be_finder = [self.find_be(row) for row in range(self.df.shape[0])]
-    self.df['be'] = [x[0] for x in be_finder]
-    self.df['be_idx'] = [x[1] for x in be_finder]
-
-  def find_prep(self, row_number):
-    """(int) -> ((str) list, (int) list) tuple
-    finds prepositions
-    """
-    all_words = np.array([str(word).lower() for word in self.df['wordlist'][row_number]])
-    poses = np.array(self.df['pos'][row_number])
-    sent = self.df['raw'][row_number]
 
-    searchval = 'adposition'
-    idx = np.where(poses == searchval)[0]
-    result = ([all_words[i] for i in sorted(idx) if all_words[i] in ['on', 'in', 'of', 'to', 'at', 'for', 'from', 'under', 'with']],
-    [np.array([word for word in self.df['wordlist'][row_number]])[i].i - sent.start for i in sorted(idx) if all_words[i] in ['on', 'in', 'of', 'to', 'at', 'for', 'from', 'under', 'with']])
-    return( result if len(result[0]) > 0 else (np.nan, np.nan))
-
-  def prep_to_df(self):
-    """(self) -> (self)
-    adds columns with prepositions to the df
-    """
-    prep_finder = [self.find_prep(row) for row in range(self.df.shape[0])]
-    self.df['prepositions'] = [x[0] for x in prep_finder]
-    self.df['prepositions_idx'] = [x[1] for x in prep_finder]
-
-  def build_df(self, text):    
-    """(str) -> (pd.dataframe)
-    initiates dataframe from str text
-    """
-
-    sentences = sentzer(text)
-
-    df = pd.DataFrame({'raw': [sent for sent in sentences.sents],
-                    'wordlist': [[word for word in sent] for sent in sentences.sents],
-                    'pos': [[spacy.explain(token.pos_) for token in nlp(str(sent))] for sent in sentences.sents],
-                    'lemma': [[token.lemma_ for token in nlp(str(sent))] for sent in sentences.sents],
-                    'dependencies': [[token.dep_ for token in nlp(str(sent))] for sent in sentences.sents]
-                    })
-    return df
+    lexicon = models.get('lexicon')
+    if lexicon.path is not None:
+      lexicon.save()
 
   ###################
   # excercise generators
@@ -273,354 +214,54 @@ class EnglishExcerciser():
     """(int) -> (dict)
     getting vocabulary selection excercises
     """
-    excercises = []
-    used_words = []
-    main_pos = {'noun': 0.35, 'verb': 0.35, 'adjective': 0.2, 'adverb': 0.1}
-
-    while len(excercises) < num_ex:
-      rows_to_check = set(range(0, self.df.shape[0])) - set(self.used_rows)
-      found = False
-      pos = np.random.choice(list(main_pos.keys()), size=1, p=list(main_pos.values())).item()
-      
-      while not found:
-        
-        if len(rows_to_check) == 0:
-            weight_to_share = main_pos[pos] / (len(main_pos) - 1)
-            main_pos.pop(pos)
-            for p in main_pos:
-              main_pos[p] += weight_to_share
-            break
-        
-        num_row = random.choice(list(rows_to_check))
-        rows_to_check.discard(num_row)
-
-        if (len(self.df['raw'][num_row]) > 8) and \
-        not (self.df[pos+'_vocab_selection_correct'][num_row] in used_words) and \
-        not (self.df[pos+'_vocab_selection_correct'][num_row] is np.nan):
-
-          correct = self.df[pos+'_vocab_selection_correct'][num_row]
-          options = self.df[pos+'_vocab_selection_options'][num_row]
-          random.shuffle(options)
-          index = self.df[pos+'_vocab_selection_idx'][num_row][0]
-
-          raw = self.df['raw'][num_row]
-          sentence = str(raw[:index]).strip()+' _____ '+str(raw[index+1:])
-          
-          ex = {'sentence': sentence,
-                'options' : [options], 
-                'answers' : correct,
-                'result'  : [''],
-                'total'   : 0
-              }
-          excercises.append(ex)
-          self.used_rows.append(num_row)
-          used_words.append(correct)
-          found = True
-
-    return excercises
+    return self.take('vocab_selection', self.iter_vocab_selection_excercises(), num_ex)
 
-  def get_past_tenses_excercises(self, num_ex=6):
-    """(int) -> (dict)
-    getting past tenses excercises
+  def iter_vocab_selection_excercises(self, rng=None, used_rows=None):
+    """(random.Random, set) -> (dict generator)
+    yields vocabulary selection excercises one by one until the sentences run out, every one with a different word.
+    rng and used_rows as in iter_indexed_excercises
     """
-    excercises = []
-    tenses = {'past_simple': 0.4, 'past_cont': 0.35, 'past_perf': 0.25}
-
-    while len(excercises) < num_ex:
-      rows_to_check = set(range(0, self.df.shape[0])) - set(self.used_rows)
-      found = False
-      tense = np.random.choice(list(tenses.keys()), size=1, p=list(tenses.values())).item()
-
-      if tense == 'past_cont':
-        search = rows_to_check & set(self.df[self.df['analytic_verb_form'] == 1].index)        
-        while not found:
-          if len(search) == 0:
-            weight_to_share = tenses[tense] / (len(tenses) - 1)
-            tenses.pop(tense)
-            for t in tenses:
-              tenses[t] += weight_to_share
-            break
-          num_row = random.choice(list(search))
-          search.discard(num_row)
-          for verb in self.df['verbs'][num_row]:
-            if (len(verb.split()) > 1) and \
-            (verb.split()[0] in ['was', 'were']) and \
-            (verb.endswith('ing')):
-              found = True
-
-      elif tense == 'past_perf':
-        search = rows_to_check & set(self.df[self.df['analytic_verb_form'] == 1].index)
-        while not found:
-          if len(search) == 0:
-            weight_to_share = tenses[tense] / (len(tenses) - 1)
-            tenses.pop(tense)
-            for t in tenses:
-              tenses[t] += weight_to_share
-            break
-          num_row = random.choice(list(search))
-          search.discard(num_row)
-          for verb in self.df['verbs'][num_row]:
-            if (len(verb.split()) > 1) and \
-            (verb.split()[0] == 'had'):
-              found = True
-        
-      else:      # past_simple
-        search = rows_to_check & set(self.df[(self.df['analytic_verb_form'] == 0) & (self.df['verbs'] is not np.nan)].index)
-        while not found:
-          if len(search) == 0:
-            weight_to_share = tenses[tense] / (len(tenses) - 1)
-            tenses.pop(tense)
-            for t in tenses:
-              tenses[t] += weight_to_share
-            break
-          num_row = random.choice(list(search))
-          search.discard(num_row)
-          for verb in self.df['verbs'][num_row]: 
-            try:
-              pastform = getInflection(self.find_verbs_lemma(verb, num_row), 'VBD')[0]
-            except:
-              pastform = 0
-            if verb == pastform:
-              found = True
-
-      all_verbs = self.df['verbs'][num_row]
-      corrects = []
-      options = []
-      indices = []
-      for i in range(len(all_verbs)):
-        verb = all_verbs[i]
-        try:
-          pastform = getInflection(self.find_verbs_lemma(verb, num_row), 'VBD')[0]
-        except:
-          pastform = 0
-        if (len(verb.split()) > 1) and \
-            (verb.split()[0] in ['was', 'were']) and \
-            (verb.endswith('ing')):
-            main_verb = self.find_verbs_lemma(verb, num_row)
-            opts = [getInflection(main_verb, 'VBD')[0], 'had ' + getInflection(main_verb, 'VBN')[0], verb]
-            random.shuffle(opts)
-            corrects.append(verb)
-            options.append(opts)
-            indices.append(self.df['verbs_idx'][num_row][i])
-          
-        elif (len(verb.split()) > 1) and (verb.split()[0] == 'had'):
-            main_verb = self.find_verbs_lemma(verb, num_row)
-            opts = [getInflection(main_verb, 'VBD')[0], 'was ' + getInflection(main_verb, 'VBG')[0], verb]
-            random.shuffle(opts)
-            corrects.append(verb)
-            options.append(opts)
-            indices.append(self.df['verbs_idx'][num_row][i])
-
-        elif verb == pastform:
-            main_verb = self.find_verbs_lemma(verb, num_row)
-            opts = ['was ' + getInflection(main_verb, 'VBG')[0], 'had ' + getInflection(main_verb, 'VBN')[0], verb]
-            random.shuffle(opts)
-            corrects.append(verb)
-            options.append(opts)
-            indices.append(self.df['verbs_idx'][num_row][i])
-
-      raw = self.df['raw'][num_row]
-
-      pieces = []
-      pieces.append(raw[:indices[0]])
-      for i in range(len(corrects)-1):
-        if len(corrects[i].split()) > 1:
-          pieces.append(raw[indices[i]+2:indices[i+1]])
-        else: pieces.append(raw[indices[i]+1:indices[i+1]])
-      if len(corrects[-1].split()) > 1:
-        pieces.append(raw[indices[-1]+2:])
-      else: pieces.append(raw[indices[-1]+1:])
-
-      sentence = ' _____ '.join([str(piece).strip() for piece in pieces])
-
-      ex = {'sentence': sentence,
-            'options' : options,
-            'answers' : corrects,
-            'result'  : ['' for _ in corrects],
-            'total'   : 0
-            }
-      excercises.append(ex)
-      self.used_rows.append(num_row)
-
-    return excercises
-
-  def get_active_passive_excercises(self, num_ex=6):
-    """(int) -> (dict)
-    getting active/passive excercises
-    """
-    excercises = []
-    voices = {'active': 0.6, 'passive': 0.4}
-
-    while len(excercises) < num_ex:
-      rows_to_check = set(range(0, self.df.shape[0])) - set(self.used_rows)
-      found = False
-      voice = np.random.choice(list(voices.keys()), size=1, p=list(voices.values())).item()
-      num = None
-
-      if voice == 'passive':
-        search = rows_to_check & set(self.df[self.df['analytic_verb_form'] == 1].index)
-        while not found:
-          if len(search) == 0:
-            weight_to_share = voices[voice] / (len(voices) - 1)
-            voices.pop(voice)
-            for v in voices:
-              voices[v] += weight_to_share
-            break
-          num_row = random.choice(list(search))
-          search.discard(num_row)
-          for verb in self.df['verbs'][num_row]:
-            if (len(verb.split()) > 1) and \
-              (verb.split()[0] in ['was', 'were', 'be', 'is', 'are', 'am']) and \
-              (verb.split()[1] == getInflection(self.find_verbs_lemma(verb, num_row), 'VBN')[0]):
-              found = True
-              num = num_row
-
-      else:      # active
-        search = rows_to_check & set(self.df[(self.df['analytic_verb_form'] == 0) & (self.df['verbs'] is not np.nan)].index)
-        while not found:
-          if len(search) == 0:
-            weight_to_share = voices[voice] / (len(voices) - 1)
-            voices.pop(voice)
-            for v in voices:
-              voices[v] += weight_to_share
-            break
-          num_row = random.choice(list(search))
-          search.discard(num_row)
-          for verb in self.df['verbs'][num_row]:
-            try:
-              pastform = getInflection(self.find_verbs_lemma(verb, num_row), 'VBD')[0]
-            except:
-              pastform = 0
-            if verb == pastform:
-              found = True
-              num = num_row
-
-      if not num:
-        continue
-      all_verbs = self.df['verbs'][num]
-      corrects = []
-      options = []
-      indices = []
-      for i in range(len(all_verbs)):
-        verb = all_verbs[i]
-        try:
-          pastform = getInflection(self.find_verbs_lemma(verb, num), 'VBD')[0]
-        except:
-          pastform = 0
-        if (len(verb.split()) > 1) and \
-          (verb.split()[0] in ['was', 'were', 'be', 'is', 'are', 'am']) and \
-          (verb.split()[1] == getInflection(self.find_verbs_lemma(verb, num), 'VBN')[0]):
-            main_verb = self.find_verbs_lemma(verb, num)
-            opts = [getInflection(main_verb, 'VBD')[0], verb]
-            random.shuffle(opts)
-            corrects.append(verb)
-            options.append(opts)
-            indices.append(self.df['verbs_idx'][num][i])
-
-        elif verb == pastform:
-            main_verb = self.find_verbs_lemma(verb, num)
-            opts = ['was ' + getInflection(main_verb, 'VBN')[0], verb]
-            random.shuffle(opts)
-            corrects.append(verb)
-            options.append(opts)
-            indices.append(self.df['verbs_idx'][num][i])
-
-      raw = self.df['raw'][num]
-      pieces = []
-      pieces.append(raw[:indices[0]])
-      for i in range(len(corrects)-1):
-        if len(corrects[i].split()) > 1:
-          pieces.append(raw[indices[i]+2:indices[i+1]])
-        else: pieces.append(raw[indices[i]+1:indices[i+1]])
-      if len(corrects[-1].split()) > 1:
-        pieces.append(raw[indices[-1]+2:])
-      else: pieces.append(raw[indices[-1]+1:])
-
-      sentence = ' _____ '.join([str(piece).strip() for piece in pieces])
-
-      ex = {'sentence': sentence,
-                'options' : options,
-                'answers' : corrects,
-                'result'  : ['' for _ in corrects],
-                'total'   : 0
-              }
-      excercises.append(ex)
-      self.used_rows.append(num_row)
-
-    return excercises
-
-  def get_be_excercises(self, num_ex=6):
-    """(int) -> (dict)
-    getting be form excercises
-    """
-    excercises = []
-
-    while len(excercises) < num_ex:
-      rows_to_check = set(range(0, self.df.shape[0])) - set(self.used_rows)
-      num_row = random.choice(list(rows_to_check))
-      rows_to_check.discard(num_row)
-
-      if self.df['be'][num_row] is not np.nan:      
-        corrects = self.df['be'][num_row]
-        indices = self.df['be_idx'][num_row]
-        
-        raw = self.df['raw'][num_row]
-        pieces = []
-        pieces.append(raw[:indices[0]])
-        for i in range(len(corrects)-1):
-          pieces.append(raw[indices[i]+1:indices[i+1]])
-        pieces.append(raw[indices[-1]+1:])
-
-        sentence = ' _____ '.join([str(piece).strip() for piece in pieces])
-        
-        ex = {'sentence': sentence,
-                    'options' : [],
-                    'answers' : corrects,
-                    'result'  : ['' for _ in corrects],
-                    'total'   : 0
-                  }
-        excercises.append(ex)
-        self.used_rows.append(num_row)
-
-    return excercises
-
-  def get_prep_excercises(self, num_ex=6):
-    """(int) -> (dict)
-    getting prepositions excercises
-    """
-    excercises = []
-
-    while len(excercises) < num_ex:
-      rows_to_check = set(range(0, self.df.shape[0])) - set(self.used_rows)
-      num_row = random.choice(list(rows_to_check))
-      rows_to_check.discard(num_row)
-
-      if (self.df['prepositions'][num_row] is not np.nan):
-        corrects = self.df['prepositions'][num_row]
-        indices = self.df['prepositions_idx'][num_row]
-
-        raw = self.df['raw'][num_row]
-        pieces = []
-        pieces.append(raw[:indices[0]])
-        for i in range(len(corrects)-1):
-          pieces.append(raw[indices[i]+1:indices[i+1]])
-        pieces.append(raw[indices[-1]+1:])
-
-        sentence = ' _____ '.join([str(piece).strip() for piece in pieces])
+    self.analyse('vocab_selection')
+    used_words = []
+    main_pos = dict(MAIN_POS)
+    rng = random if rng is None else rng
+    if used_rows is None:
+      used_rows, samplers = self.used_rows, None
+    else:
+      samplers = {pos: RowSampler(rows, rng) for pos, rows in self.index['vocab_selection'].items()}
+
+    try:
+      while len(main_pos) > 0:
+        pos = rng.choices(list(main_pos.keys()), weights=list(main_pos.values()))[0]
+        # options are found only for the sentences drawn, sentences without good options are let through and dropped
+        fits = lambda row: len(self.vocab_gaps(row, pos)) == 0 or self.vocab_gaps(row, pos)[0]['answer'] not in used_words
+        sampler = self.sampler('vocab_selection', pos) if samplers is None else samplers[pos]
+        num_row = sampler.draw(used_rows, accept=fits)
+        if num_row is None:
+          topic_index.share_weight(main_pos, pos)
+          continue
+        if len(self.vocab_gaps(num_row, pos)) == 0:
+          continue
+
+        gap = self.vocab_gaps(num_row, pos)[0]
+        correct = gap['answer']
+        options = list(gap['options'])
+        rng.shuffle(options)
+        index = gap['idx']
+
+        sentence = self.store.text_between(num_row, 0, index).strip()+' _____ '+self.store.text_between(num_row, index+1)
 
         ex = {'sentence': sentence,
-                    'options' : [],
-                    'answers' : corrects,
-                    'result'  : ['' for _ in corrects],
-                    'total'   : 0
-                  }
-        excercises.append(ex)
-        self.used_rows.append(num_row)
-
-    return excercises
-  
-  def reset_used_rows(self):
-    """(self) -> (self)
-    reset self.used_rows to start generating excercises again
-    """
-    self.used_rows = []
\ No newline at end of file
+              'options' : [options], 
+              'answers' : correct,
+              'result'  : [''],
+              'total'   : 0
+            }
+        used_rows.add(num_row)
+        used_words.append(correct)
+        yield ex
+    finally:
+      # sentences skipped for a word used by this generator can be used by the next one
+      if samplers is None:
+        for p in MAIN_POS:
+          self.sampler('vocab_selection', p).release()
@@ -0,0 +1,144 @@
+"""builds the bank of excercises the app serves curated texts from, without parsing them at request time.
+usage: python excercise_bank.py red_cap.txt texts/ -o excercise_bank.json [--topics past_tenses prepositions]
+every sentence of a text that makes an excercise of a topic gets into the bank. texts are stored under their file names,
+texts already in the bank are made again
+"""
+import os
+import sys
+import json
+import random
+import hashlib
+import argparse
+import topic_index
+from sampler import RowSampler
+
+BANK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'excercise_bank.json')
+# bump when the layout of the bank changes
+BANK_FORMAT = 1
+TOPICS = ['past_tenses', 'active_passive', 'be', 'prepositions']
+
+def text_hash(text):
+  """(str) -> (str)
+  sha256 of the text, tells the bank entry of a text that was edited since the bank was built
+  """
+  return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def fresh_copy(excercise, rng=random):
+  """(dict, random.Random) -> (dict)
+  returns a copy of the banked excercise with the options shuffled again (with rng) and no answers given yet
+  """
+  return {'sentence': excercise['sentence'],
+          'options' : [rng.sample(options, len(options)) for options in excercise['options']],
+          'answers' : list(excercise['answers']),
+          'result'  : ['' for _ in excercise['answers']],
+          'total'   : 0
+          }
+
+class ExcerciseBank():
+
+  def __init__(self, texts=None):
+    """(self, dict) -> (self)
+    excercises made beforehand: text name -> {'sha256', 'sentences', 'topics'}, where topics is
+    topic -> {'weights': subtype -> weight, 'subtypes': subtype -> rows, 'excercises': row -> excercise}.
+    excercises are in the shape get_*_excercises return them in (as in past.json). serving them needs neither spaCy nor the vectors
+    """
+    self.texts = texts if texts is not None else {}
+
+  @classmethod
+  def load(cls, path=BANK_PATH):
+    """(str) -> (ExcerciseBank)
+    reads the bank from the json file, an empty bank if there's no file or it's of an old format
+    """
+    if not os.path.exists(path):
+      return cls()
+    with open(path) as f:
+      bank = json.load(f)
+    if bank.get('format') != BANK_FORMAT:
+      return cls()
+    return cls(bank['texts'])
+
+  def save(self, path=BANK_PATH):
+    """(str) -> (None)
+    writes the bank to the json file
+    """
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+      json.dump({'format': BANK_FORMAT, 'texts': self.texts}, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+  def topics(self, name, text):
+    """(str, str) -> (str list)
+    returns the topics the bank has for the text under the name, none if the text was edited since the bank was built
+    """
+    if name not in self.texts or self.texts[name]['sha256'] != text_hash(text):
+      return []
+    return list(self.texts[name]['topics'])
+
+  def has(self, name, text, topics=TOPICS):
+    """(str, str, str list) -> (bool)
+    True if the bank has the text under the name, as it is now, with excercises of all the topics
+    """
+    banked = self.topics(name, text)
+    return all(topic in banked for topic in topics)
+
+  def add(self, name, text, excerciser, topics=TOPICS):
+    """(str, str, GrammarExcerciser, str list) -> (self)
+    puts the excercises of the topics made of every sentence the excerciser has indexed into the bank under the name
+    """
+    # imported here, serving the bank doesn't need the excercisers
+    from grammar_excerciser import WEIGHTS
+    entry = {'sha256': text_hash(text), 'sentences': len(excerciser.store), 'topics': {}}
+    for topic in topics:
+      excerciser.analyse(topic)
+      index = excerciser.index[topic]
+      excercises = {}
+      for rows in index.values():
+        for row, gaps in rows.items():
+          if str(row) not in excercises:
+            excercises[str(row)] = topic_index.excercise(excerciser.store, row, gaps)
+      entry['topics'][topic] = {'weights': WEIGHTS[topic],
+                                'subtypes': {subtype: sorted(rows) for subtype, rows in index.items()},
+                                'excercises': excercises}
+    self.texts[name] = entry
+    return self
+
+  def iter_excercises(self, name, topic, used_rows, rng=random):
+    """(str, str, set, random.Random) -> (dict generator)
+    yields banked excercises of the topic one by one the way GrammarExcerciser.iter_indexed_excercises does:
+    a subtype is chosen with its weight, then a sentence of the subtype not in used_rows. the rows are added to used_rows,
+    so the topics sharing the set (or RowSet) never give the same sentence twice. random numbers are drawn from rng
+    """
+    entry = self.texts[name]['topics'][topic]
+    weights = dict(entry['weights'])
+    samplers = {subtype: RowSampler(rows, rng) for subtype, rows in entry['subtypes'].items()}
+
+    while len(weights) > 0:
+      subtype = rng.choices(list(weights.keys()), weights=list(weights.values()))[0]
+      num_row = samplers[subtype].draw(used_rows)
+      if num_row is None:
+        topic_index.share_weight(weights, subtype)
+        continue
+      used_rows.add(num_row)
+      yield fresh_copy(entry['excercises'][str(num_row)], rng)
+
+def main():
+  from batch_excercises import find_texts
+  from grammar_excerciser import GrammarExcerciser
+
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('paths', nargs='+', help='text files and directories with .txt files')
+  parser.add_argument('-o', '--output', default=BANK_PATH)
+  parser.add_argument('--topics', nargs='+', choices=TOPICS, default=TOPICS)
+  args = parser.parse_args()
+
+  bank = ExcerciseBank.load(args.output)
+  for path in find_texts(args.paths):
+    with open(path) as f:
+      text = f.read()
+    bank.add(os.path.basename(path), text, GrammarExcerciser(text, topics=[]), args.topics)
+    counts = ', '.join('%s %d' % (topic, len(bank.texts[os.path.basename(path)]['topics'][topic]['excercises'])) for topic in args.topics)
+    print('%s: %s' % (path, counts), file=sys.stderr)
+  bank.save(args.output)
+
+if __name__ == '__main__':
+  main()
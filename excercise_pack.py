@@ -0,0 +1,191 @@
+"""compact binary format for lists of excercises (the dicts get_*_excercises return, as in past.json and vocab.json).
+usage: python excercise_pack.py past.json past.exc    (json -> pack)
+       python excercise_pack.py past.exc past.json    (pack -> json)
+       python excercise_pack.py --check past.json prep.json vocab.json    (checks the json files come back the same)
+strings (sentences, answers, options, results) are stored once in a string table, the rest are columns of string ids.
+a pack file is memory-mapped and read in place: excercise i is decoded without reading the others
+"""
+import os
+import sys
+import json
+import mmap
+import numpy as np
+
+MAGIC = b'EXCPACK2'
+# flags of an excercise
+ANSWER_STRING = 1   # 'answers' is a string (vocabulary selection), not a list
+# name and dtype of the columns, in the order they are written
+COLUMNS = [('string_start', '<u4'),   # n_strings + 1 offsets into string_bytes
+           ('string_bytes', 'u1'),    # utf-8 of all the strings
+           ('sentence', '<u4'),       # string id of the sentence of every excercise
+           ('total', '<i4'),          # 'total' of every excercise
+           ('flags', 'u1'),           # flags of every excercise
+           ('gap_start', '<u4'),      # n_excercises + 1 offsets into the gap columns
+           ('answer', '<u4'),         # string id of the answer of every gap
+           ('result', '<u4'),         # string id of the result of every gap
+           ('option_start', '<u4'),   # n_gaps + 1 offsets into option, gaps without options have none
+           ('option', '<u4'),         # string ids of the options
+           ]
+# magic, then offset and length of every column
+HEADER_BYTES = len(MAGIC) + 16 * len(COLUMNS)
+
+def check_shape(excercise):
+  """(dict) -> (None)
+  raises ValueError for an excercise the pack can't give back as it is
+  """
+  answers = [excercise['answers']] if isinstance(excercise['answers'], str) else excercise['answers']
+  strings = [excercise['sentence']] + list(answers) + list(excercise['result']) + [o for opts in excercise['options'] for o in opts]
+  if not all(isinstance(s, str) for s in strings):
+    raise ValueError('excercise strings should be str: %r' % excercise)
+  if not isinstance(excercise['total'], int):
+    raise ValueError('total should be int: %r' % excercise)
+  if len(excercise['result']) != len(answers):
+    raise ValueError('a result per answer expected: %r' % excercise)
+  if len(excercise['options']) > len(answers) or any(len(opts) == 0 for opts in excercise['options']):
+    raise ValueError('options should be non-empty lists, at most one per answer: %r' % excercise)
+
+def pack(excercises):
+  """(dict list) -> (bytes)
+  returns the excercises in the pack format. the options of an excercise go to its gaps in order,
+  excercises without options ('options': []) have gaps without options. a string answer (vocabulary selection)
+  is stored as a gap and flagged. raises ValueError for an excercise of other shape
+  """
+  strings = {}
+  def intern(s):
+    return strings.setdefault(s, len(strings))
+
+  columns = {name: [] for name, _ in COLUMNS}
+  columns['gap_start'].append(0)
+  columns['option_start'].append(0)
+  for excercise in excercises:
+    check_shape(excercise)
+    answers = excercise['answers']
+    columns['flags'].append(ANSWER_STRING if isinstance(answers, str) else 0)
+    if isinstance(answers, str):
+      answers = [answers]
+    columns['sentence'].append(intern(excercise['sentence']))
+    columns['total'].append(excercise['total'])
+    options = excercise['options'] + [[] for _ in range(len(answers) - len(excercise['options']))]
+    for answer, result, opts in zip(answers, excercise['result'], options):
+      columns['answer'].append(intern(answer))
+      columns['result'].append(intern(result))
+      columns['option'].extend(intern(option) for option in opts)
+      columns['option_start'].append(len(columns['option']))
+    columns['gap_start'].append(len(columns['answer']))
+
+  encoded = [s.encode('utf-8') for s in strings]
+  columns['string_bytes'] = b''.join(encoded)
+  columns['string_start'] = np.concatenate([[0], np.cumsum([len(e) for e in encoded], dtype=np.int64)])
+
+  header, body, offset = [MAGIC], [], HEADER_BYTES
+  for name, dtype in COLUMNS:
+    data = np.frombuffer(columns[name], dtype=dtype) if name == 'string_bytes' else np.asarray(columns[name], dtype=dtype)
+    # every column starts at a multiple of 8
+    padding = -offset % 8
+    body.append(b'\0' * padding)
+    offset += padding
+    header.append(np.array([offset, len(data)], dtype='<u8').tobytes())
+    body.append(data.tobytes())
+    offset += data.nbytes
+  return b''.join(header + body)
+
+def save(excercises, path):
+  """(dict list, str) -> (None)
+  writes the excercises to a pack file
+  """
+  with open(path, 'wb') as f:
+    f.write(pack(excercises))
+
+class ExcerciseSet():
+
+  def __init__(self, buffer):
+    """(self, bytes-like) -> (self)
+    excercises of a pack read in place: the columns are numpy views of the buffer, nothing is copied or decoded
+    until an excercise is asked for
+    """
+    if bytes(buffer[:len(MAGIC)]) != MAGIC:
+      raise ValueError('not an excercise pack')
+    self.buffer = buffer
+    header = np.frombuffer(buffer, dtype='<u8', count=2 * len(COLUMNS), offset=len(MAGIC)).reshape(-1, 2)
+    for (name, dtype), (offset, length) in zip(COLUMNS, header.tolist()):
+      setattr(self, name, np.frombuffer(buffer, dtype=dtype, count=length, offset=offset))
+
+  @classmethod
+  def load(cls, path):
+    """(str) -> (ExcerciseSet)
+    memory-maps the pack file, pages are read by the OS only when the excercises on them are used
+    """
+    with open(path, 'rb') as f:
+      return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+  def __len__(self):
+    """(self) -> (int)
+    number of excercises
+    """
+    return len(self.sentence)
+
+  def string(self, num):
+    """(int) -> (str)
+    returns the string with the id
+    """
+    return self.string_bytes[self.string_start[num]:self.string_start[num + 1]].tobytes().decode('utf-8')
+
+  def __getitem__(self, num):
+    """(int) -> (dict)
+    decodes excercise num into the dict get_*_excercises return
+    """
+    if num < 0:
+      num += len(self)
+    if not 0 <= num < len(self):
+      raise IndexError(num)
+    gaps = range(self.gap_start[num], self.gap_start[num + 1])
+    options = [[self.string(s) for s in self.option[self.option_start[g]:self.option_start[g + 1]].tolist()] for g in gaps]
+    answers = [self.string(self.answer[g]) for g in gaps]
+    return {'sentence': self.string(self.sentence[num]),
+            'options' : [opts for opts in options if opts],
+            'answers' : answers[0] if self.flags[num] & ANSWER_STRING else answers,
+            'result'  : [self.string(self.result[g]) for g in gaps],
+            'total'   : int(self.total[num])
+            }
+
+  def __iter__(self):
+    return (self[num] for num in range(len(self)))
+
+###################
+# converters
+def json_to_pack(json_path, pack_path):
+  """(str, str) -> (None)
+  converts a json list of excercises (as past.json) into a pack file
+  """
+  with open(json_path) as f:
+    save(json.load(f), pack_path)
+
+def round_trip(json_path):
+  """(str) -> (bool)
+  True if the excercises of the json file come back the same from the pack
+  """
+  with open(json_path) as f:
+    excercises = json.load(f)
+  return list(ExcerciseSet(pack(excercises))) == excercises
+
+def pack_to_json(pack_path, json_path):
+  """(str, str) -> (None)
+  converts a pack file back into a json list of excercises
+  """
+  with open(json_path, 'w') as f:
+    json.dump(list(ExcerciseSet.load(pack_path)), f, ensure_ascii=False)
+
+if __name__ == '__main__':
+  if len(sys.argv) > 2 and sys.argv[1] == '--check':
+    failed = [path for path in sys.argv[2:] if not round_trip(path)]
+    for path in sys.argv[2:]:
+      print('%s: %s' % (path, 'differs' if path in failed else 'ok'), file=sys.stderr)
+    sys.exit(1 if failed else 0)
+  if len(sys.argv) != 3:
+    sys.exit(__doc__)
+  source, target = sys.argv[1:]
+  if source.endswith('.json'):
+    json_to_pack(source, target)
+  else:
+    pack_to_json(source, target)
+  print('%s (%d bytes) -> %s (%d bytes)' % (source, os.path.getsize(source), target, os.path.getsize(target)), file=sys.stderr)
@@ -1,172 +1,278 @@
-import spacy
+import os
+import copy
+import difflib
+import itertools
+import threading
 import pandas as pd
 import numpy as np
-from spacy.lang.en import English
 import random
-from pyinflect import getInflection
-import en_core_web_sm
-
-sentzer = English()
-sentzer.add_pipe('sentencizer')
-
-# nlp = spacy.load("en_core_web_sm")
-nlp = en_core_web_sm.load()
+import models
+import inflections
+import detection
+import topic_index
+import grammar_patterns
+from token_store import TokenStore
+from sampler import RowSampler
+
+def __getattr__(name):
+  """(str) -> (object)
+  models stay importable from this module (e.g. from grammar_excerciser import nlp), but are loaded on first access, not on import
+  """
+  if name in ('nlp', 'sentzer'):
+    return models.get(name)
+  raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+# number of sentences sent to nlp.pipe at once
+BATCH_SIZE = 256
+# number of processes parsing the text. 1 parses in the current process, -1 uses all the cores
+N_PROCESS = 1
+# topic -> method adding the df columns of the topic and the first of the columns it adds
+ANALYSIS = {'past_tenses': ('verbs_to_df', 'verbs'),
+            'active_passive': ('verbs_to_df', 'verbs'),
+            'be': ('be_to_df', 'be'),
+            'prepositions': ('prep_to_df', 'prepositions'),
+            }
+# topic -> weights of its subtypes, the share of the excercises of every subtype
+WEIGHTS = {'past_tenses': {'past_simple': 0.4, 'past_cont': 0.35, 'past_perf': 0.25},
+           'active_passive': {'active': 0.6, 'passive': 0.4},
+           'be': {'be': 1.0},
+           'prepositions': {'prepositions': 1.0},
+           }
+# names of the topics in the app (type_excercises)
+TOPIC_NAMES = {'past': 'past_tenses', 'passive': 'active_passive', 'be': 'be', 'prep': 'prepositions'}
 
 class GrammarExcerciser():
+  # the topics of the excerciser, subclasses with more topics extend them
+  analysis_steps = ANALYSIS
+  topic_names = TOPIC_NAMES
+
+  def __init__(self, text, batch_size=BATCH_SIZE, n_process=N_PROCESS, cache=None, topics=None):
+    """(self, str, int, int, ParseCache, str list) -> (self)
+    analyses a str text into a token store, parsing sentences in batches of batch_size in n_process processes.
+    the df of excercise material per sentence and the index of a topic are made when the topic is first asked for,
+    topics (all of them by default) are analysed right away. topics are named as in ANALYSIS or as in TOPIC_NAMES.
+    with a ParseCache given the analysis is taken from it if the same text has already been analysed
+    initiates an empty set of sentences already used in excercises (not to produce excercises based on the same sentences)
+    """
+    self.cache, self.cache_key = cache, None
+    self.store, self.df = None, None
+    if cache is not None:
+      self.cache_key = self.make_cache_key(text)
+      self.store, self.df = cache.get_analysis(self.cache_key)
+    if self.df is None:
+      self.store = self.build_store(text, batch_size, n_process)
+      self.df = pd.DataFrame(index=range(len(self.store)))
+    self.init_analysis(self.analysis_steps if topics is None else topics)
+
+  def init_analysis(self, topics):
+    """(str list) -> (self)
+    starts the analysis of the store: analyses the topics right away, the rest of them are analysed on demand
+    """
+    self.inflections = None
+    # excercise subtype -> eligible sentences and their gaps, generators only sample from it
+    self.index = {}
+    self.lock = threading.Lock()
+    for topic in topics:
+      self.analyse(topic)
+    self.reset_used_rows()
+
+  def make_cache_key(self, text):
+    """(str) -> (str)
+    returns the key of the analysis of the text in the parse cache
+    """
+    return self.cache.make_key(text, *self.cache_key_parts())
 
-  def __init__(self, text):
-    """(self, str) -> (self)
-    builds df out of a str text
-    initiates an empty list of sentences already used in excercises (not to produce excercises based on the same sentences)
+  def cache_key_parts(self):
+    """(self) -> (str list)
+    returns what the analysis depends on besides the text: the class, the spaCy model and the grammar patterns
     """
-    self.df = self.build_df(text)
-    self.verbs_to_df()
-    self.be_to_df()
-    self.prep_to_df()
-    self.used_rows = []
+    return [type(self).__name__, models.nlp_version(), grammar_patterns.patterns_hash()]
 
   ###################
   # utils
   def get_pos(self, x):
     """(str) -> (str)
-    returns part of speech. use for found similar words to filter parts of speech
+    returns part of speech. use for found similar words to filter parts of speech.
+    looked up in the morphology lexicon, the word is tagged only the first time it is seen
     """
-    words = nlp(x)
-    for word in words:
-      return spacy.explain(word.pos_)
+    return models.get('lexicon').pos(x)
     
   def get_num(self, x):
     """(str) -> (str)
     returns Sing or Plur
     """
-    words = nlp(x)
-    for word in words:
-      return word.morph.get('Number')
+    return models.get('lexicon').number(x)
     
   def get_form(self, x):
     """(str) -> (str)
     returns verb form
     """
-    words = nlp(x)
-    for word in words:
-      return word.morph.get('VerbForm')
+    return models.get('lexicon').form(x)
 
   ###################
   # functions
   
-  def find_verbs(self, row_number):
-    """(int) -> (str list, int, int list)
-    finds verbs and combinations auxiliary-verb in a given row of the dataframe.
-    returns list of verbs, 1 for analytic verb form or 0 for synthetic and list of indices
-    used to find the verbs in the sentence
-    """
-    all_words = np.array([str(word).lower() for word in self.df['wordlist'][row_number]])
-    values = np.array(self.df['pos'][row_number])
-    lemmas = np.array(self.df['lemma'][row_number])
-
-    # A. search aux + verbs. Higher priority cause they're less numerous
-    idx = []
-    for i in range(len(values)-1):
-      if [lemmas[i], np.roll(values, -1)[i]] in [['be', 'verb'], ['have', 'verb']]:
-        idx.append(i)
-
-    # B. search for plain verbs
-    idx2 = []
-    for pos in ['auxiliary', 'verb']:
-      searchval = pos
-      idx2.extend(np.where(values == searchval)[0].tolist())
-    idx2 = [i for i in idx2 if (i not in idx and i-1 not in idx)]
-    total_idx = sorted(idx + idx2)
-    
-    # put mark 1 for analytic form of verb
-    result = [[all_words[i]+' '+all_words[i+1] if (i in idx) else all_words[i] for i in total_idx ], [1 for i in sorted(idx)] + [0 for i in sorted(idx2)], [i for i in total_idx]]
-    
-    if 1 in result[1]:
-      result[1] = 1
-    else: result[1] = 0
-    if len(result[0]) == 0:
-      result = [np.nan, np.nan, np.nan]
-
-    return result
-  
   def verbs_to_df(self):
     """(self) -> (self)
-    adds columns with verbs to the df
+    adds columns with verbs to the df: verbs and combinations auxiliary-verb, 1 for analytic verb form or 0 for synthetic,
+    indices used to find the verbs in the sentence and lemmas of the (main) verbs. found for the whole text at once
     """
-    verb_finder = [self.find_verbs(row) for row in range(self.df.shape[0])]
-    self.df['verbs'] = [x[0] for x in verb_finder]
-    self.df['analytic_verb_form'] = [x[1] for x in verb_finder]
-    self.df['verbs_idx'] = [x[2] for x in verb_finder]
-  
+    verbs, analytic, idx, lemmas = detection.find_verbs(self.store)
+    self.df['verbs'] = verbs
+    self.df['analytic_verb_form'] = analytic
+    self.df['verbs_idx'] = idx
+    self.df['verbs_lemma'] = lemmas
+
   def find_verbs_lemma(self, verb, num_row):
     """(str, int) -> (str)
     finds lemma of a verb listed in column 'verbs'. not to use with nan values in 'verbs'
     """
-    verblist = self.df['verbs'][num_row]
-    order_num = verblist.index(verb)
-    if num_row in self.df[self.df['analytic_verb_form'] == 1].index.to_list() and len(verb.split()) > 1:
-      sentence_idx = self.df['verbs_idx'][num_row][order_num] + 1
-    else: sentence_idx = self.df['verbs_idx'][num_row][order_num]
-    return self.df['lemma'][num_row][sentence_idx].lower()
-
-  def find_be(self, row_number):
-    """(int) -> ((str) list, (int) list) tuple
-    finds forms of the verb BE
-    """
-    all_words = np.array([str(word).lower() for word in self.df['wordlist'][row_number]])
-    lemmas = np.array(self.df['lemma'][row_number])
-    sent = self.df['raw'][row_number]
+    return self.df['verbs_lemma'][num_row][self.df['verbs'][num_row].index(verb)]
 
-    searchval = 'be'
-    idx = np.where(lemmas == searchval)[0]
-    result = ([all_words[i] for i in sorted(idx) if all_words[i] not in ["'s", "'re", "'m"]],
-              [np.array([word for word in self.df['wordlist'][row_number]])[i].i - sent.start for i in sorted(idx) if all_words[i] not in ["'s", "'re", "'m"]])
-    return( result if len(result[0]) > 0 else (np.nan, np.nan))
+  def inflect(self, lemma, tag):
+    """(str, str) -> (str)
+    returns the form of a verb (VBD, VBN or VBG) from the inflection table built for the text,
+    as getInflection(lemma, tag)[0] but without calling pyinflect. raises KeyError if pyinflect has no such form
+    """
+    forms = self.inflections.get(lemma) or inflections.verb_forms(lemma)
+    if forms[tag] is None:
+      raise KeyError((lemma, tag))
+    return forms[tag]
 
   def be_to_df(self):
     """(self) -> (self)
-    adds columns with be to the df
+    adds columns with forms of the verb BE and their indices to the df. found for the whole text at once
     """
-    be_finder = [self.find_be(row) for row in range(self.df.shape[0])]
-    self.df['be'] = [x[0] for x in be_finder]
-    self.df['be_idx'] = [x[1] for x in be_finder]
-
-  def find_prep(self, row_number):
-    """(int) -> ((str) list, (int) list) tuple
-    finds prepositions
-    """
-    all_words = np.array([str(word).lower() for word in self.df['wordlist'][row_number]])
-    poses = np.array(self.df['pos'][row_number])
-    sent = self.df['raw'][row_number]
-
-    searchval = 'adposition'
-    idx = np.where(poses == searchval)[0]
-    result = ([all_words[i] for i in sorted(idx) if all_words[i] in ['on', 'in', 'of', 'to', 'at', 'for', 'from', 'under', 'with']],
-    [np.array([word for word in self.df['wordlist'][row_number]])[i].i - sent.start for i in sorted(idx) if all_words[i] in ['on', 'in', 'of', 'to', 'at', 'for', 'from', 'under', 'with']])
-    return( result if len(result[0]) > 0 else (np.nan, np.nan))
+    self.df['be'], self.df['be_idx'] = detection.find_be(self.store)
 
   def prep_to_df(self):
     """(self) -> (self)
-    adds columns with prepositions to the df
+    adds columns with prepositions and their indices to the df. found for the whole text at once
     """
-    prep_finder = [self.find_prep(row) for row in range(self.df.shape[0])]
-    self.df['prepositions'] = [x[0] for x in prep_finder]
-    self.df['prepositions_idx'] = [x[1] for x in prep_finder]
-
-  def build_df(self, text):    
-    """(str) -> (pd.dataframe)
-    initiates dataframe from str text
+    self.df['prepositions'], self.df['prepositions_idx'] = detection.find_prep(self.store)
+
+  def build_store(self, text, batch_size=BATCH_SIZE, n_process=N_PROCESS):
+    """(str, int, int) -> (TokenStore)
+    analyses str text into a columnar token store.
+    every sentence is parsed once, in batches of batch_size with nlp.pipe, and all the columns are taken from that single parse.
+    with n_process > 1 (or -1 for all the cores) the batches are parsed in a pool of processes.
+    nlp.pipe gives the docs back in the order of the sentences, and all the indices are counted within a sentence,
+    so the result is the same as for a single process
     """
 
-    sentences = sentzer(text)
+    sentences = list(models.get('sentzer')(text).sents)
+    return TokenStore.from_docs(text, sentences, self.parse(sentences, batch_size, n_process))
 
-    df = pd.DataFrame({'raw': [sent for sent in sentences.sents],
-                    'wordlist': [[word for word in sent] for sent in sentences.sents],
-                    'pos': [[spacy.explain(token.pos_) for token in nlp(str(sent))] for sent in sentences.sents],
-                    'lemma': [[token.lemma_ for token in nlp(str(sent))] for sent in sentences.sents],
-                    'dependencies': [[token.dep_ for token in nlp(str(sent))] for sent in sentences.sents]
-                    })
-    return df
+  def parse(self, sentences, batch_size=BATCH_SIZE, n_process=N_PROCESS):
+    """(spacy.Span list, int, int) -> (spacy.Doc iterator)
+    parses the sentences with nlp.pipe, one doc per sentence in the order of the sentences
+    """
+    if n_process == -1:
+      n_process = os.cpu_count() or 1
+    if n_process > 1:
+      # smaller batches for short texts, otherwise some of the processes would get nothing to parse
+      batch_size = max(1, min(batch_size, -(-len(sentences) // n_process)))
+    return models.get('nlp').pipe([str(sent) for sent in sentences], batch_size=batch_size, n_process=n_process)
+
+  def update(self, text, batch_size=BATCH_SIZE, n_process=N_PROCESS):
+    """(str, int, int) -> (self)
+    re-analyses the text after an edit. the sentences of the new text are compared with the ones analysed (difflib),
+    only new and changed sentences are parsed and analysed, the rest of the store, the df and the index are kept and spliced together.
+    the topics analysed before are analysed for the new sentences. used rows are reset
+    """
+    sentences = list(models.get('sentzer')(text).sents)
+    old = [self.store.sentence(row) for row in range(len(self.store))]
+    blocks = difflib.SequenceMatcher(None, old, [str(sent) for sent in sentences], autojunk=False).get_opcodes()
+    changed = [sent for tag, i1, i2, j1, j2 in blocks if tag in ('replace', 'insert') for sent in sentences[j1:j2]]
+
+    # the new sentences are analysed as a text of their own
+    fresh = copy.copy(self)
+    fresh.cache = None
+    fresh.store = TokenStore.from_docs(text, changed, self.parse(changed, batch_size, n_process))
+    fresh.df = pd.DataFrame(index=range(len(fresh.store)))
+    fresh.init_analysis(list(self.index))
+    fresh.add_columns(self.df.columns)
+
+    # rows of the old and of the fresh analysis in the new text
+    pieces = []
+    old_rows = np.full(len(old), -1)
+    fresh_rows = np.full(len(changed), -1)
+    num_fresh = 0
+    for tag, i1, i2, j1, j2 in blocks:
+      if tag == 'equal':
+        pieces.append((self, i1, i2))
+        old_rows[i1:i2] = np.arange(j1, j2)
+      elif tag in ('replace', 'insert'):
+        pieces.append((fresh, num_fresh, num_fresh + j2 - j1))
+        fresh_rows[num_fresh:num_fresh + j2 - j1] = np.arange(j1, j2)
+        num_fresh += j2 - j1
+
+    sent_chars = np.array([(sent.start_char, sent.end_char) for sent in sentences], dtype=np.int64).reshape(-1, 2)
+    store = TokenStore.splice(text, sent_chars, [(source.store, start, end) for source, start, end in pieces])
+    columns = list(self.df.columns)
+    if len(pieces) > 0:
+      df = pd.concat([source.df[columns].iloc[start:end] for source, start, end in pieces], ignore_index=True)
+    else:
+      df = self.df.iloc[0:0]
+
+    index = {}
+    for topic in self.index:
+      index[topic] = {}
+      for subtype, rows in self.index[topic].items():
+        spliced = {int(old_rows[row]): gaps for row, gaps in rows.items() if old_rows[row] >= 0}
+        spliced.update({int(fresh_rows[row]): gaps for row, gaps in fresh.index[topic][subtype].items()})
+        index[topic][subtype] = spliced
+
+    with self.lock:
+      self.store, self.df, self.index = store, df, index
+      if fresh.inflections is not None:
+        self.inflections = dict(self.inflections or {}, **fresh.inflections)
+      if self.cache is not None:
+        self.cache_key = self.make_cache_key(text)
+        self.cache.put_analysis(self.cache_key, self.store, self.df)
+    self.reset_used_rows()
+
+  def add_columns(self, columns):
+    """(str list) -> (self)
+    adds the df columns of the analysis steps that made the columns (the columns of another df), used by update for the new sentences
+    """
+    for step, column in self.analysis_steps.values():
+      if step is not None and column in columns and column not in self.df.columns:
+        getattr(self, step)()
+
+  def edited(self, text, batch_size=BATCH_SIZE, n_process=N_PROCESS):
+    """(str, int, int) -> (GrammarExcerciser)
+    returns a new excerciser for the edited text, made as update makes it. self is not changed, so it may be shared by other sessions.
+    the df and the index are copied under the lock, another session may be adding a topic to them
+    """
+    with self.lock:
+      edited = copy.copy(self)
+      edited.df = self.df.copy()
+      edited.index = dict(self.index)
+    edited.lock = threading.Lock()
+    edited.reset_used_rows()
+    edited.update(text, batch_size, n_process)
+    return edited
+
+  def analyse(self, topic):
+    """(str) -> (self)
+    adds the df columns and the index of the topic, once. the columns are added to the cached analysis as well.
+    several threads may ask for the same topic at once, it's analysed by one of them
+    """
+    topic = self.topic_names.get(topic, topic)
+    if topic in self.index:
+      return
+    with self.lock:
+      if topic in self.index:
+        return
+      step, column = self.analysis_steps[topic]
+      if step is not None and column not in self.df.columns:
+        getattr(self, step)()
+        if self.cache is not None:
+          self.cache.put_analysis(self.cache_key, self.store, self.df)
+      if column == 'verbs' and self.inflections is None:
+        self.inflections = inflections.build_table(lemma for lemmas in self.df['verbs_lemma'] if not topic_index.missing(lemmas) for lemma in lemmas)
+      self.index[topic] = topic_index.build(self, topic)
 
   ###################
   # excercise generators
@@ -174,341 +280,99 @@ class GrammarExcerciser():
     """(int) -> (dict)
     getting past tenses excercises
     """
-    excercises = []
-    tenses = {'past_simple': 0.4, 'past_cont': 0.35, 'past_perf': 0.25}
-
-    while len(excercises) < num_ex:
-      rows_to_check = set(range(0, self.df.shape[0])) - set(self.used_rows)
-      found = False
-      tense = np.random.choice(list(tenses.keys()), size=1, p=list(tenses.values())).item()
-      num = None
-
-      if tense == 'past_cont':
-        search = rows_to_check & set(self.df[self.df['analytic_verb_form'] == 1].index)        
-        while not found:
-          if len(search) == 0:
-            if len(tenses) > 1:
-              weight_to_share = tenses[tense] / (len(tenses) - 1)
-            else: 
-              weight_to_share = tenses[tense]
-            tenses.pop(tense)
-            for t in tenses:
-              tenses[t] += weight_to_share
-            break
-          num_row = random.choice(list(search))
-          search.discard(num_row)          
-          for verb in self.df['verbs'][num_row]:
-            if (len(verb.split()) > 1) and \
-            (verb.split()[0] in ['was', 'were']) and \
-            (verb.endswith('ing')):
-              found = True
-              num = num_row
-
-      elif tense == 'past_perf':
-        search = rows_to_check & set(self.df[self.df['analytic_verb_form'] == 1].index)
-        while not found:
-          if len(search) == 0:
-            if len(tenses) > 1:
-              weight_to_share = tenses[tense] / (len(tenses) - 1)
-            else: 
-              weight_to_share = tenses[tense]
-            tenses.pop(tense)
-            for t in tenses:
-              tenses[t] += weight_to_share
-            break
-          num_row = random.choice(list(search))
-          search.discard(num_row)
-          for verb in self.df['verbs'][num_row]:
-            if (len(verb.split()) > 1) and \
-            (verb.split()[0] == 'had'):
-              found = True
-              num = num_row
-        
-      else:      # past_simple
-        search = rows_to_check & set(self.df[(self.df['analytic_verb_form'] == 0) & (self.df['verbs'] is not np.nan)].index)
-        while not found:
-          if len(search) == 0:
-            if len(tenses) > 1:
-              weight_to_share = tenses[tense] / (len(tenses) - 1)
-            else: 
-              weight_to_share = tenses[tense]
-            tenses.pop(tense)
-            for t in tenses:
-              tenses[t] += weight_to_share
-            break
-          num_row = random.choice(list(search))
-          search.discard(num_row)
-          for verb in self.df['verbs'][num_row]: 
-            try:
-              pastform = getInflection(self.find_verbs_lemma(verb, num_row), 'VBD')[0]
-            except:
-              pastform = 0
-            if verb == pastform:
-              found = True
-              num = num_row
-
-      if not num:
-        continue
-      if len(self.df['raw'][num]) < 8:
-        continue
-      
-
-      all_verbs = self.df['verbs'][num]
-      corrects = []
-      options = []
-      indices = []
-      for i in range(len(all_verbs)):
-        verb = all_verbs[i]
-        try:
-          pastform = getInflection(self.find_verbs_lemma(verb, num), 'VBD')[0]
-        except:
-          pastform = 0
-        if (len(verb.split()) > 1) and \
-            (verb.split()[0] in ['was', 'were']) and \
-            (verb.endswith('ing')):
-            main_verb = self.find_verbs_lemma(verb, num)
-            try:
-              opts = [getInflection(main_verb, 'VBD')[0], 'had ' + getInflection(main_verb, 'VBN')[0], verb]
-              random.shuffle(opts)
-              corrects.append(verb)
-              options.append(opts)
-              indices.append(self.df['verbs_idx'][num][i])
-            except:
-              pass
-          
-        elif (len(verb.split()) > 1) and (verb.split()[0] == 'had'):
-            main_verb = self.find_verbs_lemma(verb, num)
-            try:
-              opts = [getInflection(main_verb, 'VBD')[0], 'was ' + getInflection(main_verb, 'VBG')[0], verb]
-              random.shuffle(opts)
-              corrects.append(verb)
-              options.append(opts)
-              indices.append(self.df['verbs_idx'][num][i])
-            except:
-              pass
-
-        elif verb == pastform:
-            main_verb = self.find_verbs_lemma(verb, num)
-            try:
-              opts = ['was ' + getInflection(main_verb, 'VBG')[0], 'had ' + getInflection(main_verb, 'VBN')[0], verb]
-              random.shuffle(opts)
-              corrects.append(verb)
-              options.append(opts)
-              indices.append(self.df['verbs_idx'][num][i])
-            except:
-              pass
-
-      if len(corrects) == 0:
-        continue     
-      
-      raw = self.df['raw'][num]
-
-      pieces = []
-      pieces.append(raw[:indices[0]])
-      for i in range(len(corrects)-1):
-        if len(corrects[i].split()) > 1:
-          pieces.append(raw[indices[i]+2:indices[i+1]])
-        else: pieces.append(raw[indices[i]+1:indices[i+1]])
-      if len(corrects[-1].split()) > 1:
-        pieces.append(raw[indices[-1]+2:])
-      else: pieces.append(raw[indices[-1]+1:])
-
-      sentence = ' _____ '.join([str(piece).strip() for piece in pieces])
-
-      ex = {'sentence': sentence,
-            'options' : options,
-            'answers' : corrects,
-            'result'  : ['' for _ in corrects],
-            'total'   : 0
-            }
-      excercises.append(ex)
-      self.used_rows.append(num)
-
-    return excercises
+    return self.take('past_tenses', self.iter_past_tenses_excercises(), num_ex)
 
   def get_active_passive_excercises(self, num_ex=6):
     """(int) -> (dict)
     getting active/passive excercises
     """
-    excercises = []
-    voices = {'active': 0.6, 'passive': 0.4}
-
-    while len(excercises) < num_ex:
-      rows_to_check = set(range(0, self.df.shape[0])) - set(self.used_rows)
-      found = False
-      voice = np.random.choice(list(voices.keys()), size=1, p=list(voices.values())).item()
-      num = None
-
-      if voice == 'passive':
-        search = rows_to_check & set(self.df[self.df['analytic_verb_form'] == 1].index)
-        while not found:
-          if len(search) == 0:
-            if len(voices) > 1:
-              weight_to_share = voices[voice] / (len(voices) - 1)
-            else: 
-              weight_to_share = voices[voice]            
-            voices.pop(voice)
-            for v in voices:
-              voices[v] += weight_to_share
-            break
-          num_row = random.choice(list(search))
-          search.discard(num_row)
-          for verb in self.df['verbs'][num_row]:
-            if (len(verb.split()) > 1) and \
-              (verb.split()[0] in ['was', 'were', 'be', 'is', 'are', 'am']) and \
-              (verb.split()[1] == getInflection(self.find_verbs_lemma(verb, num_row), 'VBN')[0]):
-              found = True
-              num = num_row
-
-      else:      # active
-        search = rows_to_check & set(self.df[(self.df['analytic_verb_form'] == 0) & (self.df['verbs'] is not np.nan)].index)
-        while not found:
-          if len(search) == 0:
-            if len(voices) > 1:
-              weight_to_share = voices[voice] / (len(voices) - 1)
-            else: 
-              weight_to_share = voices[voice]            
-            voices.pop(voice)
-            for v in voices:
-              voices[v] += weight_to_share
-            break
-          num_row = random.choice(list(search))
-          search.discard(num_row)
-          for verb in self.df['verbs'][num_row]:
-            try:
-              pastform = getInflection(self.find_verbs_lemma(verb, num_row), 'VBD')[0]
-            except:
-              pastform = 0
-            if verb == pastform:
-              found = True
-              num = num_row
-
-      if not num:
-        continue
-      all_verbs = self.df['verbs'][num]
-      corrects = []
-      options = []
-      indices = []
-      for i in range(len(all_verbs)):
-        verb = all_verbs[i]
-        try:
-          pastform = getInflection(self.find_verbs_lemma(verb, num), 'VBD')[0]
-        except:
-          pastform = 0
-        if (len(verb.split()) > 1) and \
-          (verb.split()[0] in ['was', 'were', 'be', 'is', 'are', 'am']) and \
-          (verb.split()[1] == getInflection(self.find_verbs_lemma(verb, num), 'VBN')[0]):
-            main_verb = self.find_verbs_lemma(verb, num)
-            opts = [getInflection(main_verb, 'VBD')[0], verb]
-            random.shuffle(opts)
-            corrects.append(verb)
-            options.append(opts)
-            indices.append(self.df['verbs_idx'][num][i])
-
-        elif verb == pastform:
-            main_verb = self.find_verbs_lemma(verb, num)
-            opts = ['was ' + getInflection(main_verb, 'VBN')[0], verb]
-            random.shuffle(opts)
-            corrects.append(verb)
-            options.append(opts)
-            indices.append(self.df['verbs_idx'][num][i])
-
-      raw = self.df['raw'][num]
-      pieces = []
-      pieces.append(raw[:indices[0]])
-      for i in range(len(corrects)-1):
-        if len(corrects[i].split()) > 1:
-          pieces.append(raw[indices[i]+2:indices[i+1]])
-        else: pieces.append(raw[indices[i]+1:indices[i+1]])
-      if len(corrects[-1].split()) > 1:
-        pieces.append(raw[indices[-1]+2:])
-      else: pieces.append(raw[indices[-1]+1:])
-
-      sentence = ' _____ '.join([str(piece).strip() for piece in pieces])
-
-      ex = {'sentence': sentence,
-                'options' : options,
-                'answers' : corrects,
-                'result'  : ['' for _ in corrects],
-                'total'   : 0
-              }
-      excercises.append(ex)
-      self.used_rows.append(num_row)
-
-    return excercises
+    return self.take('active_passive', self.iter_active_passive_excercises(), num_ex)
 
   def get_be_excercises(self, num_ex=6):
     """(int) -> (dict)
     getting be form excercises
     """
-    excercises = []
-
-    while len(excercises) < num_ex:
-      rows_to_check = set(range(0, self.df.shape[0])) - set(self.used_rows)
-      num_row = random.choice(list(rows_to_check))
-      rows_to_check.discard(num_row)
-
-      if self.df['be'][num_row] is not np.nan:      
-        corrects = self.df['be'][num_row]
-        indices = self.df['be_idx'][num_row]
-        
-        raw = self.df['raw'][num_row]
-        pieces = []
-        pieces.append(raw[:indices[0]])
-        for i in range(len(corrects)-1):
-          pieces.append(raw[indices[i]+1:indices[i+1]])
-        pieces.append(raw[indices[-1]+1:])
-
-        sentence = ' _____ '.join([str(piece).strip() for piece in pieces])
-        
-        ex = {'sentence': sentence,
-                    'options' : [],
-                    'answers' : corrects,
-                    'result'  : ['' for _ in corrects],
-                    'total'   : 0
-                  }
-        excercises.append(ex)
-        self.used_rows.append(num_row)
-
-    return excercises
+    return self.take('be', self.iter_be_excercises(), num_ex)
 
   def get_prep_excercises(self, num_ex=6):
     """(int) -> (dict)
     getting prepositions excercises
     """
-    excercises = []
-
-    while len(excercises) < num_ex:
-      rows_to_check = set(range(0, self.df.shape[0])) - set(self.used_rows)
-      num_row = random.choice(list(rows_to_check))
-      rows_to_check.discard(num_row)
-
-      if (self.df['prepositions'][num_row] is not np.nan):
-        corrects = self.df['prepositions'][num_row]
-        indices = self.df['prepositions_idx'][num_row]
-
-        raw = self.df['raw'][num_row]
-        pieces = []
-        pieces.append(raw[:indices[0]])
-        for i in range(len(corrects)-1):
-          pieces.append(raw[indices[i]+1:indices[i+1]])
-        pieces.append(raw[indices[-1]+1:])
-
-        sentence = ' _____ '.join([str(piece).strip() for piece in pieces])
-
-        ex = {'sentence': sentence,
-                    'options' : [],
-                    'answers' : corrects,
-                    'result'  : ['' for _ in corrects],
-                    'total'   : 0
-                  }
-        excercises.append(ex)
-        self.used_rows.append(num_row)
-
-    return excercises
+    return self.take('prepositions', self.iter_prep_excercises(), num_ex)
+
+  def iter_past_tenses_excercises(self, rng=None, used_rows=None):
+    """(random.Random, set) -> (dict generator)
+    yields past tenses excercises one by one until the sentences run out
+    """
+    return self.iter_indexed_excercises('past_tenses', WEIGHTS['past_tenses'], rng, used_rows)
+
+  def iter_active_passive_excercises(self, rng=None, used_rows=None):
+    """(random.Random, set) -> (dict generator)
+    yields active/passive excercises one by one until the sentences run out
+    """
+    return self.iter_indexed_excercises('active_passive', WEIGHTS['active_passive'], rng, used_rows)
+
+  def iter_be_excercises(self, rng=None, used_rows=None):
+    """(random.Random, set) -> (dict generator)
+    yields be form excercises one by one until the sentences run out
+    """
+    return self.iter_indexed_excercises('be', WEIGHTS['be'], rng, used_rows)
+
+  def iter_prep_excercises(self, rng=None, used_rows=None):
+    """(random.Random, set) -> (dict generator)
+    yields prepositions excercises one by one until the sentences run out
+    """
+    return self.iter_indexed_excercises('prepositions', WEIGHTS['prepositions'], rng, used_rows)
+
+  def iter_indexed_excercises(self, topic, weights, rng=None, used_rows=None):
+    """(str, dict, random.Random, set) -> (dict generator)
+    yields excercises of the topic from the index: a subtype is chosen with its weight, then a sentence of the subtype not used yet.
+    when a subtype has no sentences left its weight is shared among the other subtypes, stops when there are no sentences left at all.
+    the topic is analysed when the first excercise is asked for.
+    by default the generators share random and self.used_rows. a generator given its own rng and used_rows draws with its own
+    samplers and doesn't touch the state of the excerciser, so many users can draw from one excerciser at once
+    """
+    self.analyse(topic)
+    weights = dict(weights)
+    rng = random if rng is None else rng
+    if used_rows is None:
+      used_rows, samplers = self.used_rows, None
+    else:
+      samplers = {subtype: RowSampler(rows, rng) for subtype, rows in self.index[topic].items()}
+
+    while len(weights) > 0:
+      subtype = rng.choices(list(weights.keys()), weights=list(weights.values()))[0]
+      sampler = self.sampler(topic, subtype) if samplers is None else samplers[subtype]
+      num_row = sampler.draw(used_rows)
+      if num_row is None:
+        topic_index.share_weight(weights, subtype)
+        continue
+      used_rows.add(num_row)
+      yield topic_index.excercise(self.store, num_row, self.index[topic][subtype][num_row], rng)
+
+  def take(self, topic, excercises, num_ex):
+    """(str, generator, int) -> (dict list)
+    returns the first num_ex excercises of the generator, fewer if it runs out. the number made is kept in self.produced[topic]
+    """
+    try:
+      taken = list(itertools.islice(excercises, num_ex))
+    finally:
+      excercises.close()
+    self.produced[topic] = len(taken)
+    return taken
+
+  def sampler(self, topic, subtype):
+    """(str, str) -> (RowSampler)
+    returns the sampler of the rows of the subtype, made on first use
+    """
+    if (topic, subtype) not in self.samplers:
+      self.samplers[(topic, subtype)] = RowSampler(self.index[topic][subtype])
+    return self.samplers[(topic, subtype)]
   
   def reset_used_rows(self):
     """(self) -> (self)
-    reset self.used_rows to start generating excercises again
+    reset self.used_rows (and the samplers drawing from the index) to start generating excercises again
     """
-    self.used_rows = []
\ No newline at end of file
+    self.used_rows = set()
+    self.samplers = {}
+    self.produced = {}
\ No newline at end of file
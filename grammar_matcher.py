@@ -0,0 +1,36 @@
+from spacy.language import Language
+from spacy.matcher import Matcher
+from spacy.tokens import Doc, Span
+from grammar_patterns import PATTERNS
+
+def span_matches(span):
+  """(spacy.Span) -> (list)
+  returns (label, start, end) of the matches inside the span, start and end counted from the beginning of the span
+  """
+  return [(label, start - span.start, end - span.start) for label, start, end in span.doc._.grammar or []
+          if start >= span.start and end <= span.end]
+
+if not Doc.has_extension('grammar'):
+  Doc.set_extension('grammar', default=None)
+if not Span.has_extension('grammar'):
+  Span.set_extension('grammar', getter=span_matches)
+
+class GrammarMatcher():
+
+  def __init__(self, vocab, patterns=PATTERNS):
+    """(self, spacy.Vocab, dict) -> (self)
+    pipeline component finding the grammar patterns with a spaCy Matcher.
+    the matches are stored in doc._.grammar as (label, start, end) and are seen from sentences as span._.grammar
+    """
+    self.matcher = Matcher(vocab)
+    for label, pattern in patterns.items():
+      self.matcher.add(label, pattern)
+
+  def __call__(self, doc):
+    strings = doc.vocab.strings
+    doc._.grammar = [(strings[match_id], start, end) for match_id, start, end in self.matcher(doc)]
+    return doc
+
+@Language.factory('grammar_matcher')
+def create_grammar_matcher(nlp, name):
+  return GrammarMatcher(nlp.vocab)
@@ -0,0 +1,28 @@
+"""the grammar patterns grammar_matcher finds, kept apart from the component so they can be read without importing spaCy"""
+import json
+import hashlib
+
+PREPOSITIONS = ['on', 'in', 'of', 'to', 'at', 'for', 'from', 'under', 'with']
+# contracted forms of be can't be typed into a gap
+BE_EXCLUDED = ["'s", "'re", "'m"]
+AUXILIARIES = ['be', 'have']
+
+# label -> Matcher patterns. a new grammar topic is a new label here, the matches of all the labels are found in one pass
+PATTERNS = {
+  # any verb or auxiliary
+  'verb': [[{'POS': {'IN': ['AUX', 'VERB']}}]],
+  # analytic verb form: be/have followed by a verb
+  'aux_verb': [[{'LEMMA': {'IN': AUXILIARIES}}, {'POS': 'VERB'}]],
+  'past_cont': [[{'LEMMA': {'IN': AUXILIARIES}, 'LOWER': {'IN': ['was', 'were']}}, {'POS': 'VERB', 'LOWER': {'REGEX': 'ing$'}}]],
+  'past_perf': [[{'LEMMA': {'IN': AUXILIARIES}, 'LOWER': 'had'}, {'POS': 'VERB'}]],
+  # candidates only: whether the verb is the past participle is checked against the inflections of its lemma
+  'passive': [[{'LEMMA': {'IN': AUXILIARIES}, 'LOWER': {'IN': ['was', 'were', 'be', 'is', 'are', 'am']}}, {'POS': 'VERB'}]],
+  'be': [[{'LEMMA': 'be', 'LOWER': {'NOT_IN': BE_EXCLUDED}}]],
+  'prep': [[{'POS': 'ADP', 'LOWER': {'IN': PREPOSITIONS}}]],
+}
+
+def patterns_hash(patterns=PATTERNS):
+  """(dict) -> (str)
+  sha256 of the patterns. the parse cache stores the matches, so a change of the patterns must change the cache key
+  """
+  return hashlib.sha256(json.dumps(patterns, sort_keys=True).encode('utf-8')).hexdigest()
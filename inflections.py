@@ -0,0 +1,26 @@
+import functools
+import models
+
+# verb forms used by the excercise generators
+TAGS = ('VBD', 'VBN', 'VBG')
+# number of lemmas kept in memory across texts
+CACHE_SIZE = 20000
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def verb_forms(lemma):
+  """(str) -> (dict)
+  returns tag -> first form given by pyinflect (None if there's none) for all the TAGS.
+  memoized across texts, least recently used lemmas are dropped. the dict is shared, do not modify it
+  """
+  inflect = models.get('inflect')
+  forms = {}
+  for tag in TAGS:
+    found = inflect(lemma, tag)
+    forms[tag] = found[0] if found else None
+  return forms
+
+def build_table(lemmas):
+  """(str iterable) -> (dict)
+  returns lemma -> forms for all the lemmas
+  """
+  return {lemma: verb_forms(lemma) for lemma in set(lemmas)}
@@ -0,0 +1,98 @@
+import os
+import json
+import tempfile
+import threading
+import models
+
+# number of words sent to nlp.pipe at once when filling the lexicon
+BATCH_SIZE = 1024
+
+class MorphLexicon():
+
+  def __init__(self, path=None):
+    """(self, str) -> (self)
+    memoized table word -> (part of speech, Number, VerbForm), as the spaCy model tags the word standing alone.
+    unseen words are tagged in batches with nlp.pipe. with a path the table is read from it and can be saved back,
+    entries made by another version of the model are dropped
+    """
+    self.path = path
+    self.table = {}
+    self.lock = threading.Lock()
+    if path is not None and os.path.exists(path):
+      self.load(path)
+
+  ###################
+  # utils
+  def tag(self, doc):
+    """(spacy.Doc) -> (str, str list, str list) tuple
+    returns part of speech, Number and VerbForm of the first token of the doc
+    """
+    import spacy
+    for word in doc:
+      return spacy.explain(word.pos_), word.morph.get('Number'), word.morph.get('VerbForm')
+    return None, None, None
+
+  def load(self, path):
+    """(str) -> (self)
+    """
+    with open(path) as f:
+      data = json.load(f)
+    if data.get('model') == models.nlp_version():
+      self.table.update({word: tuple(entry) for word, entry in data['words'].items()})
+
+  def save(self, path=None):
+    """(str) -> (self)
+    writes the table as json to path (or to the path the lexicon was read from)
+    """
+    path = path or self.path
+    with self.lock:
+      words = dict(self.table)
+    # a temp file of its own for every writer, threads of one process may save at once
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    try:
+      with os.fdopen(fd, 'w') as f:
+        json.dump({'model': models.nlp_version(), 'words': words}, f)
+      os.replace(tmp, path)
+    except BaseException:
+      os.remove(tmp)
+      raise
+
+  ###################
+  # functions
+  def fill(self, words, batch_size=BATCH_SIZE):
+    """(str iterable, int) -> (self)
+    tags the words missing in the table, in one nlp.pipe pass
+    """
+    unseen = [word for word in dict.fromkeys(words) if word not in self.table]
+    if len(unseen) == 0:
+      return
+    tags = [self.tag(doc) for doc in models.get('nlp').pipe(unseen, batch_size=batch_size)]
+    with self.lock:
+      self.table.update(zip(unseen, tags))
+
+  def lookup(self, word):
+    """(str) -> (str, str list, str list) tuple
+    """
+    try:
+      return self.table[word]
+    except KeyError:
+      self.fill([word])
+      return self.table[word]
+
+  def pos(self, word):
+    """(str) -> (str)
+    returns part of speech
+    """
+    return self.lookup(word)[0]
+
+  def number(self, word):
+    """(str) -> (str list)
+    returns Sing or Plur
+    """
+    return self.lookup(word)[1]
+
+  def form(self, word):
+    """(str) -> (str list)
+    returns verb form
+    """
+    return self.lookup(word)[2]
@@ -0,0 +1,130 @@
+import os
+import threading
+from importlib import metadata
+
+NLP_MODEL = 'en_core_web_sm'
+VECTORS_NAME = 'glove-wiki-gigaword-100'
+# local copy of the word vectors, memory-mapped by every process using them
+VECTORS_DIR = os.environ.get('EXCERCISER_VECTORS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'vectors'))
+# optional json file the morphology lexicon is read from and saved to
+LEXICON_PATH = os.environ.get('EXCERCISER_LEXICON')
+
+# name -> function loading the model. models are loaded on first use, not on import
+_loaders = {}
+_models = {}
+_locks = {}
+
+def register(name, loader):
+  """(str, function) -> (None)
+  registers a function loading a model under the name. the model is not loaded yet
+  """
+  _loaders[name] = loader
+  _locks[name] = threading.Lock()
+  _models.pop(name, None)
+
+def get(name):
+  """(str) -> (object)
+  returns the model, loading it on first use. loaded once per process even with several threads asking at once
+  """
+  try:
+    return _models[name]
+  except KeyError:
+    pass
+  with _locks[name]:
+    if name not in _models:
+      _models[name] = _loaders[name]()
+  return _models[name]
+
+def is_loaded(name):
+  """(str) -> (bool)
+  """
+  return name in _models
+
+def warm_up(names=None):
+  """(str list) -> (None)
+  loads the listed models (all the registered ones by default), e.g. at server start
+  """
+  for name in (names if names is not None else list(_loaders)):
+    get(name)
+
+def nlp_version():
+  """(None) -> (str)
+  returns name and version of the spaCy model, without loading it when the model is an installed package
+  """
+  try:
+    return NLP_MODEL + '-' + metadata.version(NLP_MODEL)
+  except metadata.PackageNotFoundError:
+    meta = get('nlp').meta
+    return meta.get('lang', '') + '_' + meta.get('name', '') + '-' + meta.get('version', '')
+
+###################
+# loaders
+def load_nlp():
+  import spacy
+  # registers the grammar_matcher component
+  import grammar_matcher
+  nlp = spacy.load(NLP_MODEL)
+  nlp.add_pipe('grammar_matcher')
+  return nlp
+
+def load_sentzer():
+  from spacy.lang.en import English
+  sentzer = English()
+  sentzer.add_pipe('sentencizer')
+  return sentzer
+
+def load_inflect():
+  from pyinflect import getInflection
+  return getInflection
+
+def vectors_path():
+  """(None) -> (str)
+  returns the path of the local copy of the word vectors
+  """
+  return os.path.join(VECTORS_DIR, VECTORS_NAME + '.kv')
+
+def export_word_vectors(path=None):
+  """(str) -> (str)
+  downloads the word vectors with gensim.downloader and saves them in gensim's native format:
+  the big arrays (vectors and their norms) go to separate .npy files, so that they can be memory-mapped.
+  returns the path
+  """
+  import gensim.downloader as api
+  path = path or vectors_path()
+  os.makedirs(os.path.dirname(path), exist_ok=True)
+  word_vectors = api.load(VECTORS_NAME)
+  word_vectors.fill_norms()
+  word_vectors.save(path, separately=['vectors', 'norms'])
+  return path
+
+def load_lexicon():
+  from lexicon import MorphLexicon
+  return MorphLexicon(LEXICON_PATH)
+
+def load_word_vectors():
+  # read-only memory map: all the processes share one page-cached copy of the vectors
+  from gensim.models import KeyedVectors
+  path = vectors_path()
+  if not os.path.exists(path):
+    export_word_vectors(path)
+  return KeyedVectors.load(path, mmap='r')
+
+def load_similarity():
+  from similarity import SimilarityEngine
+  return SimilarityEngine(get('word_vectors'))
+
+def load_similarity_lsh():
+  from similarity import LSHIndex
+  return LSHIndex(get('word_vectors'))
+
+register('nlp', load_nlp)
+register('sentzer', load_sentzer)
+register('inflect', load_inflect)
+register('lexicon', load_lexicon)
+register('word_vectors', load_word_vectors)
+register('similarity', load_similarity)
+register('similarity_lsh', load_similarity_lsh)
+
+if __name__ == '__main__':
+  # prepare the local vector store before starting the app: python models.py
+  print(export_word_vectors())
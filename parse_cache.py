@@ -0,0 +1,142 @@
+import os
+import pickle
+import hashlib
+import tempfile
+from importlib import metadata
+
+# bump when the layout of the cached analysis changes, so that old entries are never read back
+CACHE_FORMAT = 4
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.parse_cache')
+# 200 MB
+MAX_BYTES = 200 * 1024 * 1024
+
+class ParseCache():
+
+  def __init__(self, path=CACHE_DIR, max_bytes=MAX_BYTES):
+    """(self, str, int) -> (self)
+    on-disk cache of analysed texts, one file per text in the directory path.
+    when the files take more than max_bytes the least recently used ones are deleted.
+    counts hits, misses and evictions
+    """
+    self.path = path
+    self.max_bytes = max_bytes
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+    os.makedirs(self.path, exist_ok=True)
+
+  ###################
+  # utils
+  def make_key(self, text, *parts):
+    """(str, str...) -> (str)
+    returns the key of a text: hash of its content along with parts (class name, model name and version, hash of the grammar patterns, etc.)
+    so that a new model never gets an analysis made by an old one
+    """
+    h = hashlib.sha256()
+    for part in (str(CACHE_FORMAT), metadata.version('spacy')) + tuple(str(p) for p in parts):
+      h.update(part.encode('utf-8'))
+      h.update(b'\0')
+    h.update(text.encode('utf-8'))
+    return h.hexdigest()
+
+  def file_name(self, key):
+    """(str) -> (str)
+    returns the path of the file for the key
+    """
+    return os.path.join(self.path, key + '.pkl')
+
+  def size(self):
+    """(self) -> (int)
+    returns total size of the cached files in bytes
+    """
+    return sum(os.path.getsize(os.path.join(self.path, f)) for f in os.listdir(self.path) if f.endswith('.pkl'))
+
+  def stats(self):
+    """(self) -> (dict)
+    returns hit/miss/eviction counters
+    """
+    return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+  ###################
+  # functions
+  def get(self, key):
+    """(str) -> (object)
+    returns the cached payload or None. a hit marks the file as recently used
+    """
+    name = self.file_name(key)
+    try:
+      with open(name, 'rb') as f:
+        payload = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+      self.misses += 1
+      return None
+    self.hits += 1
+    try:
+      os.utime(name)
+    except OSError:
+      pass
+    return payload
+
+  def put(self, key, payload):
+    """(str, object) -> (self)
+    stores the payload and evicts least recently used files if the cache got too big
+    """
+    # a temp file of its own for every writer, threads of one process may put the same key at once
+    fd, tmp = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+    try:
+      with os.fdopen(fd, 'wb') as f:
+        pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+      os.replace(tmp, self.file_name(key))
+    except BaseException:
+      os.remove(tmp)
+      raise
+    self.evict()
+
+  def evict(self):
+    """(self) -> (self)
+    deletes least recently used files until the cache fits into max_bytes
+    """
+    files = []
+    for f in os.listdir(self.path):
+      if f.endswith('.pkl'):
+        # another process or thread may have evicted it since listdir
+        try:
+          stat = os.stat(os.path.join(self.path, f))
+        except FileNotFoundError:
+          continue
+        files.append((stat.st_mtime, stat.st_size, f))
+    total = sum(x[1] for x in files)
+    for _, size, f in sorted(files):
+      if total <= self.max_bytes:
+        break
+      try:
+        os.remove(os.path.join(self.path, f))
+      except OSError:
+        continue
+      total -= size
+      self.evictions += 1
+
+  def clear(self):
+    """(self) -> (self)
+    deletes all the cached files
+    """
+    for f in os.listdir(self.path):
+      if f.endswith('.pkl'):
+        os.remove(os.path.join(self.path, f))
+
+  ###################
+  # analysis payloads
+  def get_analysis(self, key):
+    """(str) -> (TokenStore, pd.dataframe) tuple
+    returns the cached token store and excercise dataframe, (None, None) if the text is not in the cache
+    """
+    payload = self.get(key)
+    if payload is None:
+      return None, None
+    return payload['store'], payload['columns']
+
+  def put_analysis(self, key, store, df):
+    """(str, TokenStore, pd.dataframe) -> (self)
+    stores the analysis of a text: the token store and the excercise dataframe
+    """
+    self.put(key, {'store': store, 'columns': df})
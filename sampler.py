@@ -0,0 +1,138 @@
+import random
+
+class RowSampler():
+
+  def __init__(self, rows, rng=random):
+    """(self, int iterable, random.Random) -> (self)
+    draws rows without replacement: the rows are shuffled once and a cursor goes through them,
+    so every draw takes O(1) (amortized over the rows skipped). rows are shuffled with rng, random.seed makes the default repeatable
+    """
+    self.rows = sorted(rows)
+    rng.shuffle(self.rows)
+    self.cursor = 0
+    self.held = []
+
+  def __len__(self):
+    """(self) -> (int)
+    number of rows not drawn yet (some of them may be used by other topics already)
+    """
+    return len(self.rows) - self.cursor + len(self.held)
+
+  def draw(self, used, accept=None):
+    """(set, function) -> (int)
+    returns the next row not in used, None when the rows ran out.
+    rows accept says no to are held back until release
+    """
+    while self.cursor < len(self.rows):
+      row = self.rows[self.cursor]
+      self.cursor += 1
+      if row in used:
+        continue
+      if accept is not None and not accept(row):
+        self.held.append(row)
+        continue
+      return row
+    return None
+
+  def release(self):
+    """(self) -> (self)
+    puts the rows held back by draw at the end of the queue
+    """
+    self.rows.extend(self.held)
+    self.held = []
+
+class RowSet():
+
+  def __init__(self, size):
+    """(self, int) -> (self)
+    set of the rows 0..size-1 kept as a bitset, a bit per row. works with RowSampler.draw as the used rows
+    """
+    self.bits = bytearray((size + 7) // 8)
+    self.count = 0
+
+  def __contains__(self, row):
+    return bool(self.bits[row >> 3] & (1 << (row & 7)))
+
+  def __len__(self):
+    return self.count
+
+  def add(self, row):
+    """(int) -> (None)
+    adds the row to the set
+    """
+    if row not in self:
+      self.bits[row >> 3] |= 1 << (row & 7)
+      self.count += 1
+
+  def discard(self, row):
+    """(int) -> (None)
+    removes the row from the set if it's there
+    """
+    if row in self:
+      self.bits[row >> 3] &= ~(1 << (row & 7)) & 0xff
+      self.count -= 1
+
+# topic -> generator of the excerciser
+ITERATORS = {'past_tenses': 'iter_past_tenses_excercises',
+             'active_passive': 'iter_active_passive_excercises',
+             'be': 'iter_be_excercises',
+             'prepositions': 'iter_prep_excercises',
+             'vocab_selection': 'iter_vocab_selection_excercises'}
+
+class SessionSampler():
+
+  def __init__(self, analysis, seed=None, bank=None, name=None):
+    """(self, GrammarExcerciser, int, ExcerciseBank, str) -> (self)
+    sampling state of one user over an analysis shared by many: an rng and the used rows as a RowSet, shared by the topics
+    so that a sentence is given once. the analysis is only read (topics not analysed yet are added to it under its lock),
+    its own used rows are never touched.
+    with a bank the topics it has for the text under the name are drawn from the bank with the same rng and used rows,
+    the analysis is only needed for the other topics (it may be None if there are none, and set later)
+    """
+    self.analysis = analysis
+    self.bank, self.name = bank, name
+    self.rng = random.Random(seed)
+    self.reset()
+
+  def banked(self, topic):
+    """(str) -> (bool)
+    True if the excercises of the topic are drawn from the bank
+    """
+    return self.bank is not None and topic in self.bank.texts[self.name]['topics']
+
+  def rows(self, topic):
+    """(str) -> (set)
+    the sentences of the topic
+    """
+    if self.banked(topic):
+      subtypes = self.bank.texts[self.name]['topics'][topic]['subtypes'].values()
+    else:
+      self.analysis.analyse(topic)
+      subtypes = self.analysis.index[topic].values()
+    return set().union(*subtypes)
+
+  def remaining(self, topic):
+    """(str) -> (int)
+    number of sentences of the topic not given to this user yet
+    """
+    return sum(1 for row in self.rows(topic) if row not in self.used_rows)
+
+  def reset(self, topic=None):
+    """(str) -> (self)
+    forgets the sentences given to this user, they can be given again. with a topic only its sentences are forgotten
+    (for the other topics having them as well too), the rest are still not given again
+    """
+    if topic is not None:
+      for row in self.rows(topic):
+        self.used_rows.discard(row)
+      return
+    size = len(self.analysis.store) if self.analysis is not None else self.bank.texts[self.name]['sentences']
+    self.used_rows = RowSet(size)
+
+  def iter_excercises(self, topic):
+    """(str) -> (dict generator)
+    yields excercises of the topic made of sentences not given to this user yet
+    """
+    if self.banked(topic):
+      return self.bank.iter_excercises(self.name, topic, self.used_rows, self.rng)
+    return getattr(self.analysis, ITERATORS[topic])(rng=self.rng, used_rows=self.used_rows)
@@ -0,0 +1,193 @@
+import numpy as np
+
+# number of query vectors multiplied by the whole vector matrix at once.
+# the similarity matrix of a batch takes vocabulary size * BATCH_SIZE * 4 bytes (50 MB for glove and 32 queries)
+BATCH_SIZE = 32
+
+class SimilarityEngine():
+
+  def __init__(self, word_vectors, batch_size=BATCH_SIZE):
+    """(self, KeyedVectors, int) -> (self)
+    exact nearest neighbours for many words at once: queries are stacked into a matrix and compared
+    with the whole vocabulary by one matrix multiplication per batch, top-k is taken by partitioning.
+    gives the same neighbours as similar_by_word and most_similar of gensim
+    """
+    self.word_vectors = word_vectors
+    self.batch_size = batch_size
+    word_vectors.fill_norms()
+    # vectors are not normalized in place, they may be a read-only memory map
+    self.inv_norms = (1 / np.maximum(word_vectors.norms, 1e-12)).astype(np.float32)
+
+  ###################
+  # utils
+  def unit_vector(self, word):
+    """(str) -> (np.array)
+    """
+    return self.word_vectors.get_vector(word, norm=True)
+
+  def query(self, positive, negative=()):
+    """(str list, str list) -> (np.array, int list)
+    returns the unit query vector built like in gensim's most_similar (mean of unit vectors, negative ones subtracted)
+    along with the indices of the words used, which are never returned as neighbours
+    """
+    vectors = [self.unit_vector(w) for w in positive] + [-self.unit_vector(w) for w in negative]
+    mean = np.mean(vectors, axis=0)
+    mean /= max(np.linalg.norm(mean), 1e-12)
+    return mean.astype(np.float32), [self.word_vectors.get_index(w) for w in list(positive) + list(negative)]
+
+  def top_k(self, queries, excluded, topn):
+    """(np.array, (int list) list, int) -> ((str, float) list) list
+    returns topn most similar words with their cosine similarity for every row of queries,
+    skipping the indices in the matching excluded list
+    """
+    keys = self.word_vectors.index_to_key
+    vectors = self.word_vectors.vectors
+    n = len(keys)
+    result = []
+    for start in range(0, len(queries), self.batch_size):
+      batch = queries[start:start+self.batch_size]
+      sims = batch @ vectors.T
+      sims *= self.inv_norms
+      for j, idx in enumerate(excluded[start:start+self.batch_size]):
+        sims[j, idx] = -np.inf
+      k = min(topn, n)
+      best = np.argpartition(sims, n-k, axis=1)[:, n-k:] if k < n else np.tile(np.arange(n), (len(batch), 1))
+      for j in range(len(batch)):
+        row = best[j][np.argsort(-sims[j, best[j]], kind='stable')]
+        result.append([(keys[i], float(sims[j, i])) for i in row if sims[j, i] != -np.inf])
+    return result
+
+  ###################
+  # functions
+  def similar_by_words(self, words, topn=10):
+    """(str list, int) -> (dict)
+    word -> topn most similar words, as word_vectors.similar_by_word(word, topn) for every word.
+    words missing in the vocabulary are left out
+    """
+    words = [w for w in dict.fromkeys(words) if w in self.word_vectors.key_to_index]
+    queries = [self.query([w]) for w in words]
+    if not queries:
+      return {}
+    found = self.top_k(np.stack([q[0] for q in queries]), [q[1] for q in queries], topn)
+    return dict(zip(words, found))
+
+  def most_similar_by_pair(self, words, pair=('good', 'bad'), topn=10):
+    """(str list, (str, str), int) -> (dict)
+    word -> topn most similar words as word_vectors.most_similar(positive=[word, pair[0]], negative=pair[1], topn) for every word.
+    words missing in the vocabulary are left out
+    """
+    words = [w for w in dict.fromkeys(words) if w in self.word_vectors.key_to_index]
+    queries = [self.query([w, pair[0]], [pair[1]]) for w in words]
+    if not queries:
+      return {}
+    found = self.top_k(np.stack([q[0] for q in queries]), [q[1] for q in queries], topn)
+    return dict(zip(words, found))
+
+  def neighbours(self, words, topn=10, pairs=(('good', 'bad'),), pair_topn=5):
+    """(str list, int, (str, str) list, int) -> (dict)
+    word -> (similar words, similar words by pairs): both kinds of neighbours EnglishExcerciser.get_options needs,
+    for all the words at once
+    """
+    similar = self.similar_by_words(words, topn)
+    by_pairs = [self.most_similar_by_pair(words, pair, pair_topn) for pair in pairs]
+    return {w: (similar[w], [x for found in by_pairs for x in found.get(w, [])]) for w in similar}
+
+# random-projection LSH parameters: number of hash tables and of hyperplanes (bits) per table.
+# with 14 bits glove's 400k words fall into ~25 words per bucket. see bench_neighbours.py to choose them per deployment
+N_TABLES = 16
+N_BITS = 14
+# number of candidate vectors gathered to score a batch of queries at once (6 MB of glove's 100-d vectors).
+# scoring is bound by gathering the vectors, bigger batches fall out of the cache and get slower
+CANDIDATE_BATCH = 1 << 14
+
+class LSHIndex(SimilarityEngine):
+
+  def __init__(self, word_vectors, n_tables=N_TABLES, n_bits=N_BITS, probe=True, seed=0, batch_size=BATCH_SIZE):
+    """(self, KeyedVectors, int, int, bool, int, int) -> (self)
+    approximate nearest neighbours by random-projection LSH, built locally with numpy.
+    every table hashes a vector into the signs of its projections on n_bits random hyperplanes,
+    words of the query's buckets (and, with probe, of the buckets one bit away) are the candidates,
+    and only the candidates are scored exactly. same interface as SimilarityEngine
+    """
+    super().__init__(word_vectors, batch_size)
+    self.n_tables = n_tables
+    self.n_bits = n_bits
+    self.probe = probe
+    rng = np.random.default_rng(seed)
+    self.planes = rng.standard_normal((word_vectors.vector_size, n_tables * n_bits)).astype(np.float32)
+    self.bit_weights = (1 << np.arange(n_bits)).astype(np.int64)
+
+    # bucket keys of all the words in all the tables (table number in the high bits), sorted,
+    # so that a bucket is a range found by binary search
+    vectors = word_vectors.vectors
+    keys = np.empty((len(vectors), n_tables), dtype=np.int64)
+    for start in range(0, len(vectors), 65536):
+      keys[start:start+65536] = self.hash(vectors[start:start+65536])
+    keys = keys.T.ravel()
+    order = np.argsort(keys, kind='stable')
+    self.sorted_keys = keys[order]
+    self.words = (order % len(vectors)).astype(np.int32)
+
+  ###################
+  # utils
+  def hash(self, vectors):
+    """(np.array) -> (np.array)
+    returns bucket keys of the vectors (rows) in every table, shape (len(vectors), n_tables)
+    """
+    bits = (vectors @ self.planes > 0).reshape(len(vectors), self.n_tables, self.n_bits)
+    return (bits.astype(np.int64) @ self.bit_weights) | (np.arange(self.n_tables, dtype=np.int64) << self.n_bits)
+
+  def candidates(self, keys):
+    """(np.array) -> (np.array)
+    returns indices of the words sharing a bucket with the query keys (one key per table)
+    """
+    probes = keys[None, :]
+    if self.probe:
+      probes = np.concatenate([probes, keys[None, :] ^ self.bit_weights[:, None]])
+    probes = probes.ravel()
+    left = np.searchsorted(self.sorted_keys, probes, side='left')
+    lengths = np.searchsorted(self.sorted_keys, probes, side='right') - left
+    total = lengths.sum()
+    if total == 0:
+      return np.empty(0, dtype=np.int32)
+    # concatenation of the ranges left[i]:left[i]+lengths[i]
+    positions = np.repeat(left - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+    # sorted and deduplicated, a mask over the vocabulary would cost its size for every query
+    words = np.sort(self.words[positions])
+    return words[np.concatenate(([True], words[1:] != words[:-1]))]
+
+  def top_k(self, queries, excluded, topn):
+    """(np.array, (int list) list, int) -> ((str, float) list) list
+    returns topn most similar words with their cosine similarity for every row of queries, looking only at the candidates.
+    the candidates of a batch of queries are gathered into one padded array and scored together.
+    queries with fewer candidates than needed are answered exactly
+    """
+    keys = self.word_vectors.index_to_key
+    vectors = self.word_vectors.vectors
+    buckets = self.hash(np.asarray(queries))
+    cands = [self.candidates(buckets[j]) for j in range(len(queries))]
+    cands = [cand[~np.isin(cand, excluded[j])] for j, cand in enumerate(cands)]
+    exact = [j for j, cand in enumerate(cands) if len(cand) < topn]
+    result = dict(zip(exact, super().top_k(queries[exact], [excluded[j] for j in exact], topn) if exact else []))
+
+    # queries with as many candidates go into the same batch, so little of it is padding
+    approximate = sorted((j for j, cand in enumerate(cands) if len(cand) >= topn), key=lambda j: len(cands[j]))
+    start = 0
+    while start < len(approximate):
+      # as many queries as fit into CANDIDATE_BATCH when padded to the longest of them, the last one
+      end = start + 1
+      while end < len(approximate) and (end - start + 1) * len(cands[approximate[end]]) <= CANDIDATE_BATCH:
+        end += 1
+      batch = approximate[start:end]
+      width = len(cands[batch[-1]])
+      padded = np.zeros((len(batch), width), dtype=np.int64)
+      for i, j in enumerate(batch):
+        padded[i, :len(cands[j])] = cands[j]
+      sims = np.matmul(vectors[padded], queries[batch][:, :, None])[:, :, 0] * self.inv_norms[padded]
+      sims[np.arange(width) >= np.array([len(cands[j]) for j in batch])[:, None]] = -np.inf
+      best = np.argpartition(sims, width-topn, axis=1)[:, width-topn:]
+      for i, j in enumerate(batch):
+        row = best[i][np.argsort(-sims[i, best[i]], kind='stable')]
+        result[j] = [(keys[padded[i, k]], float(sims[i, k])) for k in row]
+      start = end
+    return [result[j] for j in range(len(queries))]
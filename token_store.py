@@ -0,0 +1,217 @@
+import numpy as np
+
+class TokenStore():
+
+  def __init__(self, text, sent_chars, sent_tokens, tok_start, tok_end, lower, pos, lemma, dep, strings,
+               sent_matches, match_label, match_start, match_end):
+    """(self, str, np.array, np.array, np.array, np.array, np.array, np.array, np.array, np.array, str list, np.array, np.array, np.array, np.array) -> (self)
+    columnar analysis of a text: flat arrays over all the tokens of the text instead of spaCy objects.
+    sent_chars: (n_sents, 2) char offsets of the sentences in text
+    sent_tokens: (n_sents + 1) offsets of the sentences in the token arrays
+    tok_start, tok_end: char offsets of the tokens within their sentence
+    lower, pos, lemma, dep: ids of lowercased word, part of speech (as spacy.explain gives it), lemma and dependency in strings
+    sent_matches: (n_sents + 1) offsets of the sentences in the match arrays
+    match_label, match_start, match_end: id of the label in strings and tokens of the grammar_matcher matches within their sentence
+    """
+    self.text = text
+    self.sent_chars = sent_chars
+    self.sent_tokens = sent_tokens
+    self.tok_start = tok_start
+    self.tok_end = tok_end
+    self.lower = lower
+    self.pos = pos
+    self.lemma = lemma
+    self.dep = dep
+    self.strings = strings
+    self.sent_matches = sent_matches
+    self.match_label = match_label
+    self.match_start = match_start
+    self.match_end = match_end
+    self.string_ids = {s: i for i, s in enumerate(strings)}
+    self.string_array = np.array(strings, dtype=object)
+
+  def __len__(self):
+    """(self) -> (int)
+    number of sentences
+    """
+    return len(self.sent_chars)
+
+  def __getstate__(self):
+    # lookup tables are rebuilt on load, only the arrays and the strings are pickled
+    state = self.__dict__.copy()
+    del state['string_ids'], state['string_array']
+    return state
+
+  def __setstate__(self, state):
+    self.__dict__.update(state)
+    self.string_ids = {s: i for i, s in enumerate(self.strings)}
+    self.string_array = np.array(self.strings, dtype=object)
+
+  @classmethod
+  def from_docs(cls, text, sentences, docs):
+    """(str, spacy.Span list, spacy.Doc list) -> (TokenStore)
+    builds the store out of the sentences of the text and their parses (one doc per sentence)
+    """
+    import spacy
+    strings = []
+    string_ids = {}
+    def intern(s):
+      try:
+        return string_ids[s]
+      except KeyError:
+        string_ids[s] = len(strings)
+        strings.append(s)
+        return string_ids[s]
+
+    explained = {}
+    columns = {'tok_start': [], 'tok_end': [], 'lower': [], 'pos': [], 'lemma': [], 'dep': [],
+               'match_label': [], 'match_start': [], 'match_end': []}
+    sent_tokens = [0]
+    sent_matches = [0]
+    for doc in docs:
+      for token in doc:
+        if token.pos_ not in explained:
+          explained[token.pos_] = intern(spacy.explain(token.pos_))
+        columns['tok_start'].append(token.idx)
+        columns['tok_end'].append(token.idx + len(token.text))
+        columns['lower'].append(intern(token.lower_))
+        columns['pos'].append(explained[token.pos_])
+        columns['lemma'].append(intern(token.lemma_))
+        columns['dep'].append(intern(token.dep_))
+      sent_tokens.append(sent_tokens[-1] + len(doc))
+      matches = sorted(doc._.grammar or [], key=lambda match: (match[1], match[2]))
+      for label, start, end in matches:
+        columns['match_label'].append(intern(label))
+        columns['match_start'].append(start)
+        columns['match_end'].append(end)
+      sent_matches.append(sent_matches[-1] + len(matches))
+
+    sent_chars = np.array([(sent.start_char, sent.end_char) for sent in sentences], dtype=np.int64).reshape(-1, 2)
+    arrays = {name: np.array(values, dtype=np.int32) for name, values in columns.items()}
+    return cls(text, sent_chars, np.array(sent_tokens, dtype=np.int64), strings=strings,
+               sent_matches=np.array(sent_matches, dtype=np.int64), **arrays)
+
+  @classmethod
+  def splice(cls, text, sent_chars, pieces):
+    """(str, np.array, (TokenStore, int, int) list) -> (TokenStore)
+    builds the store of text out of ranges of sentences of other stores: pieces are (store, first row, row after the last one)
+    in the order of the sentences of text, sent_chars are the char offsets of all the sentences in text.
+    offsets of tokens and matches are counted within their sentence, so the sentences are copied as they are
+    """
+    strings = []
+    string_ids = {}
+    remaps = {}
+    columns = {'tok_start': [], 'tok_end': [], 'lower': [], 'pos': [], 'lemma': [], 'dep': [],
+               'match_label': [], 'match_start': [], 'match_end': []}
+    sent_tokens = [np.zeros(1, dtype=np.int64)]
+    sent_matches = [np.zeros(1, dtype=np.int64)]
+    for store, start, end in pieces:
+      # ids of the strings of every store in the new string table
+      if id(store) not in remaps:
+        for s in store.strings:
+          if s not in string_ids:
+            string_ids[s] = len(strings)
+            strings.append(s)
+        remaps[id(store)] = np.array([string_ids[s] for s in store.strings], dtype=np.int32)
+      remap = remaps[id(store)]
+
+      first, last = store.sent_tokens[start], store.sent_tokens[end]
+      for name in ('tok_start', 'tok_end'):
+        columns[name].append(getattr(store, name)[first:last])
+      for name in ('lower', 'pos', 'lemma', 'dep'):
+        columns[name].append(remap[getattr(store, name)[first:last]])
+      sent_tokens.append(sent_tokens[-1][-1] + store.sent_tokens[start+1:end+1] - first)
+
+      first, last = store.sent_matches[start], store.sent_matches[end]
+      columns['match_label'].append(remap[store.match_label[first:last]])
+      columns['match_start'].append(store.match_start[first:last])
+      columns['match_end'].append(store.match_end[first:last])
+      sent_matches.append(sent_matches[-1][-1] + store.sent_matches[start+1:end+1] - first)
+
+    arrays = {name: np.concatenate(values).astype(np.int32) if len(values) else np.zeros(0, dtype=np.int32) for name, values in columns.items()}
+    return cls(text, sent_chars, np.concatenate(sent_tokens), strings=strings, sent_matches=np.concatenate(sent_matches), **arrays)
+
+  ###################
+  # sentences
+  def sentence(self, row):
+    """(int) -> (str)
+    returns text of the sentence
+    """
+    start, end = self.sent_chars[row]
+    return self.text[start:end]
+
+  def n_tokens(self, row):
+    """(int) -> (int)
+    returns number of tokens in the sentence
+    """
+    return int(self.sent_tokens[row+1] - self.sent_tokens[row])
+
+  def text_between(self, row, start=0, end=None):
+    """(int, int, int) -> (str)
+    returns text of the tokens start..end-1 of the sentence (indices within the sentence, as in slicing a spaCy span)
+    """
+    n = self.n_tokens(row)
+    end = n if end is None else min(end, n)
+    start = min(start, n)
+    if start >= end:
+      return ''
+    first = self.sent_tokens[row]
+    chars = self.sent_chars[row][0]
+    return self.text[chars + self.tok_start[first+start]:chars + self.tok_end[first+end-1]]
+
+  ###################
+  # token columns of a sentence
+  def column(self, name, row):
+    """(str, int) -> (np.array)
+    returns the strings of the column (lower, pos, lemma or dep) for the tokens of the sentence
+    """
+    ids = getattr(self, name)[self.sent_tokens[row]:self.sent_tokens[row+1]]
+    return self.string_array[ids]
+
+  def words(self, row):
+    """(int) -> (np.array)
+    returns lowercased words of the sentence
+    """
+    return self.column('lower', row)
+
+  def poses(self, row):
+    """(int) -> (np.array)
+    returns parts of speech of the words of the sentence
+    """
+    return self.column('pos', row)
+
+  def lemmas(self, row):
+    """(int) -> (np.array)
+    returns lemmas of the words of the sentence
+    """
+    return self.column('lemma', row)
+
+  def dependencies(self, row):
+    """(int) -> (np.array)
+    returns dependencies of the words of the sentence
+    """
+    return self.column('dep', row)
+
+  ###################
+  # grammar_matcher matches
+  def match_positions(self, label):
+    """(str) -> (np.array)
+    returns sorted positions (in the token arrays of the whole text) of the first tokens of the matches with the label
+    """
+    found = self.match_label == self.string_id(label)
+    sentence = np.repeat(np.arange(len(self)), np.diff(self.sent_matches))
+    return np.sort(self.sent_tokens[sentence[found]] + self.match_start[found])
+
+  def string_id(self, s):
+    """(str) -> (int)
+    returns id of the string in the store, -1 if the text has no such string
+    """
+    return self.string_ids.get(s, -1)
+
+  def nbytes(self):
+    """(self) -> (int)
+    approximate memory taken by the store
+    """
+    arrays = [self.sent_chars, self.sent_tokens, self.tok_start, self.tok_end, self.lower, self.pos, self.lemma, self.dep,
+              self.sent_matches, self.match_label, self.match_start, self.match_end]
+    return sum(a.nbytes for a in arrays) + len(self.text) + sum(len(s) for s in self.strings)
@@ -0,0 +1,164 @@
+import random
+import numpy as np
+
+# sentences shorter than that (in tokens) are not used for past tenses excercises
+MIN_PAST_TENSES_TOKENS = 8
+# sentences should be longer than that (in tokens) for vocabulary selection excercises
+MIN_VOCAB_TOKENS = 8
+# grammar_matcher labels the verb subtypes are told by
+VERB_LABELS = ['past_cont', 'past_perf', 'passive']
+MAIN_POS = ['noun', 'verb', 'adjective', 'adverb']
+
+###################
+# utils
+def missing(value):
+  """(object) -> (bool)
+  True for nan values in the df
+  """
+  return isinstance(value, float) and value != value
+
+def gap(answer, options, idx):
+  """(str, str list, int) -> (dict)
+  one gap of an excercise: right answer, options (None for the excercises without options), index of its first token
+  and number of tokens it takes in the sentence
+  """
+  return {'answer': answer, 'options': options, 'idx': idx, 'length': len(answer.split())}
+
+def share_weight(weights, key):
+  """(dict, str) -> (dict)
+  drops the key, its weight is shared among the rest of the keys
+  """
+  weight = weights.pop(key)
+  for k in weights:
+    weights[k] += weight / len(weights)
+  return weights
+
+def gapped_sentence(store, row, gaps):
+  """(TokenStore, int, dict list) -> (str)
+  returns the sentence with ' _____ ' instead of every gap
+  """
+  pieces = [store.text_between(row, 0, gaps[0]['idx'])]
+  for previous, following in zip(gaps, gaps[1:]):
+    pieces.append(store.text_between(row, previous['idx'] + previous['length'], following['idx']))
+  pieces.append(store.text_between(row, gaps[-1]['idx'] + gaps[-1]['length']))
+  return ' _____ '.join([piece.strip() for piece in pieces])
+
+def excercise(store, row, gaps, rng=random):
+  """(TokenStore, int, dict list, random.Random) -> (dict)
+  makes an excercise out of the gaps of the sentence. options are shuffled with rng, the index keeps them in order
+  """
+  options = []
+  for g in gaps:
+    if g['options'] is not None:
+      opts = list(g['options'])
+      rng.shuffle(opts)
+      options.append(opts)
+  return {'sentence': gapped_sentence(store, row, gaps),
+          'options' : options,
+          'answers' : [g['answer'] for g in gaps],
+          'result'  : ['' for _ in gaps],
+          'total'   : 0
+          }
+
+def past_options(excerciser, verb, lemma, labels):
+  """(GrammarExcerciser, str, str, set) -> (str, str list) tuple
+  returns tense of the verb (past_cont, past_perf or past_simple) and options to choose from, (None, None) for other verbs
+  or verbs pyinflect can't inflect. labels are the grammar_matcher labels of the matches starting at the verb,
+  past_cont and past_perf are told by them, past_simple is a verb in the past form of its lemma
+  """
+  inflect = excerciser.inflect
+  try:
+    if 'past_cont' in labels:
+      return 'past_cont', [inflect(lemma, 'VBD'), 'had ' + inflect(lemma, 'VBN'), verb]
+    if 'past_perf' in labels:
+      return 'past_perf', [inflect(lemma, 'VBD'), 'was ' + inflect(lemma, 'VBG'), verb]
+    if verb == inflect(lemma, 'VBD'):
+      return 'past_simple', ['was ' + inflect(lemma, 'VBG'), 'had ' + inflect(lemma, 'VBN'), verb]
+  except KeyError:
+    pass
+  return None, None
+
+def voice_options(excerciser, verb, lemma, labels):
+  """(GrammarExcerciser, str, str, set) -> (str, str list) tuple
+  returns voice of the verb (passive or active, for past simple verbs) and options to choose from, (None, None) for other verbs.
+  a passive candidate is matched by grammar_matcher (labels as in past_options), here it's only checked to be the past participle
+  """
+  inflect = excerciser.inflect
+  try:
+    if 'passive' in labels and verb.split()[1] == inflect(lemma, 'VBN'):
+      return 'passive', [inflect(lemma, 'VBD'), verb]
+    if verb == inflect(lemma, 'VBD'):
+      return 'active', ['was ' + inflect(lemma, 'VBN'), verb]
+  except KeyError:
+    pass
+  return None, None
+
+###################
+# indexes: excercise subtype -> {row: gaps}
+def verb_topics(excerciser, topics, options_of, min_tokens=0):
+  """(GrammarExcerciser, dict, function, int) -> (dict)
+  indexes rows for the verb topics. topics gives the value of 'analytic_verb_form' a row of the subtype should have.
+  a row gets into a subtype if one of its verbs is of the subtype, the gaps are made of all the verbs options_of finds options for.
+  options_of gets the VERB_LABELS of the grammar matches starting at every verb
+  """
+  df, store = excerciser.df, excerciser.store
+  index = {topic: {} for topic in topics}
+  starts = {label: set(store.match_positions(label).tolist()) for label in VERB_LABELS}
+  for row in range(len(df)):
+    verbs = df['verbs'][row]
+    if missing(verbs) or store.n_tokens(row) < min_tokens:
+      continue
+    kinds, gaps = set(), []
+    for verb, lemma, idx in zip(verbs, df['verbs_lemma'][row], df['verbs_idx'][row]):
+      position = store.sent_tokens[row] + idx
+      kind, options = options_of(excerciser, verb, lemma, {label for label in VERB_LABELS if position in starts[label]})
+      if kind is not None:
+        kinds.add(kind)
+        gaps.append(gap(verb, options, idx))
+    for topic in kinds & set(topics):
+      if df['analytic_verb_form'][row] == topics[topic]:
+        index[topic][row] = gaps
+  return index
+
+def column_topic(df, answers, indices):
+  """(pd.dataframe, str, str) -> (dict)
+  indexes rows having something in the column answers. gaps have no options
+  """
+  index = {}
+  for row in range(len(df)):
+    if not missing(df[answers][row]):
+      index[row] = [gap(answer, None, idx) for answer, idx in zip(df[answers][row], df[indices][row])]
+  return index
+
+def vocab_topics(store):
+  """(TokenStore) -> (dict)
+  indexes rows for vocabulary selection, a subtype per part of speech: long enough sentences with words of the POS
+  (as EnglishExcerciser.find_main_pos finds them), found over the token arrays of the whole text at once.
+  the gaps are None until the options are found for the sentence (EnglishExcerciser.vocab_gaps)
+  """
+  sentence = np.repeat(np.arange(len(store)), np.diff(store.sent_tokens))
+  long_enough = np.diff(store.sent_tokens) > MIN_VOCAB_TOKENS
+  # words of letters only, longer than one letter
+  word_ok = np.array([s.isalpha() and len(s) > 1 for s in store.strings], dtype=bool)
+  index = {}
+  for pos in MAIN_POS:
+    found = (store.pos == store.string_id(pos)) & word_ok[store.lower]
+    rows = np.unique(sentence[found])
+    index[pos] = dict.fromkeys(rows[long_enough[rows]].tolist())
+  return index
+
+def build(excerciser, topic):
+  """(GrammarExcerciser, str) -> (dict)
+  returns subtype -> {row: gaps} for the topic. the df columns of the topic should be there already
+  """
+  if topic == 'past_tenses':
+    return verb_topics(excerciser, {'past_simple': 0, 'past_cont': 1, 'past_perf': 1}, past_options, MIN_PAST_TENSES_TOKENS)
+  elif topic == 'active_passive':
+    return verb_topics(excerciser, {'active': 0, 'passive': 1}, voice_options)
+  elif topic == 'be':
+    return {'be': column_topic(excerciser.df, 'be', 'be_idx')}
+  elif topic == 'prepositions':
+    return {'prepositions': column_topic(excerciser.df, 'prepositions', 'prepositions_idx')}
+  elif topic == 'vocab_selection':
+    return vocab_topics(excerciser.store)
+  raise KeyError(topic)